@@ -4,6 +4,7 @@ logging.basicConfig(level=logging.INFO)
 from dyna_controller import DynaController
 from camera_manager import CameraManager
 from image_processor import ImageProcessor
+from video_pipeline import VideoPipeline
 from calibrate import Calibrator
 from dart_track import dart_track
 from CTkMessagebox import CTkMessagebox
@@ -11,6 +12,9 @@ from multiprocessing import Process
 from PIL import Image, ImageTk
 import customtkinter as ctk
 from mocap_stream import *
+from shm_ring import FrameRing
+from marker_tracker import MarkerTracker
+from marker_fusion import MarkerFusion
 import vec_math2 as vm2
 import tkinter as tk
 import numpy as np
@@ -46,15 +50,20 @@ class DART:
         # Create an instance of CameraManager
         self.camera_manager = CameraManager()
 
+        # Capture and processing run off the Tk thread; the GUI only displays the newest result
+        self.video_pipeline = VideoPipeline(self.camera_manager, self.image_pro)
+
         # Create an instance of Calibrator
         self.calibrator = Calibrator()
         
-        # try:
-        #     self.target = MoCap(stream_type='3d')
-        #     self.target.calibration_target = True
-        # except Exception as e:
-        #     logging.error(f"Error connecting to QTM: {e}")
-        #     self.target = None
+        # Single QTM ingest; frames are shared with the tracking process through shared memory
+        self.frame_ring = FrameRing.create()
+        try:
+            self.target = MoCap(stream_type='3d', ring=self.frame_ring, fusion=MarkerFusion(), marker_tracker=MarkerTracker())
+            self.target.calibration_target = True
+        except Exception as e:
+            logging.error(f"Error connecting to QTM: {e}")
+            self.target = None
 
         try:
             self.dyna = DynaController(com_port='COM5')
@@ -71,6 +80,7 @@ class DART:
         self.is_live = False
         self.is_saving_images = False
         self.image_folder = "images"
+        self.last_display_frame = 0
 
         # Image processing GUI flags
         self.show_crosshair = tk.BooleanVar(value=False)
@@ -80,6 +90,11 @@ class DART:
         # Motor control values
         self.pan_value = 0
         self.tilt_value = 0
+        self.last_move_time = 0.0
+
+        # Streaming calibration state
+        self.is_calibrating = False
+        self.last_calibration_frame = None
 
     def setup_gui_elements(self):
         self.video_label = ctk.CTkLabel(self.window, text="")
@@ -111,6 +126,10 @@ class DART:
         self.calibration_button = ctk.CTkButton(dyn_control_frame, text="Calibrate", command=self.calibrate)
         self.calibration_button.pack(side="top", padx=10, pady=10)
 
+        # Create a button for the four-point calibration, which takes one marker pair per press
+        self.point_calibration_button = ctk.CTkButton(dyn_control_frame, text="Capture 4-Point Pair", command=self.capture_calibration_pair)
+        self.point_calibration_button.pack(side="top", padx=10, pady=10)
+
         # Create a track button
         self.track_button = ctk.CTkButton(dyn_control_frame, text="Track", command=self.track)
         self.track_button.pack(side="top", padx=10, pady=10)
@@ -154,7 +173,7 @@ class DART:
             img_processing_frame,
             text="Detect",
             variable=self.detect_flag,
-            command=lambda: setattr(self.image_pro, 'detect_circle_flag', self.detect_flag.get()),
+            command=lambda: self.image_pro.set_detect_circle(self.detect_flag.get()),
             onvalue=True,
             offvalue=False
         )
@@ -179,22 +198,55 @@ class DART:
         self.strength_label.pack()
 
     def calibrate(self):
-        p1 = np.array(self.target.position)
-        p2 = np.array(self.target.position2)
+        # Toggle streaming calibration; solve over every sample when it is stopped
+        self.is_calibrating = not self.is_calibrating
+        self.calibration_button.configure(text="Finish Calibration" if self.is_calibrating else "Calibrate")
+
+        if self.is_calibrating:
+            self.calibrator.clear_samples()
+            self.collect_calibration_sample()
+            return
+
+        report = self.calibrator.solve_samples()
+        if report is None:
+            CTkMessagebox(title="Error", message="Calibration failed: move the beam to more pan/tilt angles", icon="cancel")
+        else:
+            CTkMessagebox(title="Calibrated", icon="check",
+                          message=f"{report.num_samples} samples\nLine RMS: {report.line_rms:.2f} mm\n"
+                                  f"Direction RMS: {report.angle_rms:.3f} deg")
+
+    def capture_calibration_pair(self):
+        # Four-point calibration: take both markers from the same frame; every second press solves
+        frame = self.target.snapshot.read()
+        p1 = frame['position'].copy()
+        p2 = frame['position2'].copy()
         self.calibrator.run(p1, p2)
 
+    def collect_calibration_sample(self):
+        if not self.is_calibrating:
+            return
+
+        # Take both markers from the same frame, once the mirrors have settled at the slider angles
+        frame = self.target.snapshot.read()
+        settled = time.perf_counter() - self.last_move_time > 0.3
+        is_new = frame['frame_number'] != self.last_calibration_frame
+        if settled and is_new and not frame['lost']:
+            p1 = frame['position'].copy()
+            p2 = frame['position2'].copy()
+            if np.linalg.norm(p2 - p1) > 10:
+                # The sliders drive the servos in the opposite sense to the tracker's pan/tilt mapping
+                self.calibrator.add_sample(p1, p2, -self.pan_value, -self.tilt_value)
+                self.last_calibration_frame = frame['frame_number']
+
+        self.window.after(20, self.collect_calibration_sample)
+
     def track(self):
         if self.calibrator.calibrated:
-            # Close QTM connections
-            self.target._close()
-            self.target.close()
-
-            # Close serial port
+            # Hand the serial port over; the tracker retries opening it until it is released
             self.dyna.close_port()
 
-            time.sleep(1) # HACK: Add small blocking delay to allow serial port to close
-
-            self.track_process = Process(target=dart_track)
+            # The tracker follows this process's QTM stream instead of reconnecting
+            self.track_process = Process(target=dart_track, kwargs={'ring_name': self.frame_ring.name})
             self.track_process.start()
         else:
             # Add popup window to notify user that DART is not calibrated
@@ -205,11 +257,14 @@ class DART:
         self.is_live = not self.is_live
         self.toggle_video_button.configure(text="Stop Live Feed" if self.is_live else "Start Live Feed")
         if self.is_live:
+            self.video_pipeline.start()
             self.update_video_label()
+        else:
+            self.video_pipeline.stop()
 
     def toggle_image_saving(self):
-        self.camera_manager.release()
         self.is_saving_images = not self.is_saving_images
+        self.video_pipeline.is_saving = self.is_saving_images
         self.record_button.configure(text="Stop Saving Images" if self.is_saving_images else "Start Saving Images")
 
     def adjust_exposure(self, exposure_value: float):
@@ -222,33 +277,21 @@ class DART:
 
     def update_video_label(self):
         if self.is_live:
-            ret, frame = self.camera_manager.read_frame()
-            if ret:
-                # Flip the frame horizontally
-                frame = cv2.flip(frame, 1)
-                
-                # Process the frame with all the selected options
-                processed_frame = self.image_pro.process_frame(frame)
-                self.display_frame(processed_frame)
-                
-                # Save the original or processed frame if needed
-                self.save_frame(processed_frame)
-
-            self.window.after(30, self.update_video_label)
+            # Only show the newest processed frame; anything older was already superseded
+            latest = self.video_pipeline.latest(self.last_display_frame)
+            if latest is not None:
+                self.last_display_frame, frame = latest
+                self.display_frame(frame)
+
+            self.window.after(15, self.update_video_label)
 
     def display_frame(self, frame):
-        cv_img = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        pil_img = Image.fromarray(cv_img)
+        # Frames from the pipeline are already RGB
+        pil_img = Image.fromarray(frame)
         imgtk = ImageTk.PhotoImage(image=pil_img)
         self.video_label.imgtk = imgtk
         self.video_label.configure(image=imgtk)
 
-    def save_frame(self, frame):
-        if self.is_saving_images:
-            timestamp = time.strftime("%Y%m%d-%H%M%S")
-            filename = os.path.join(self.image_folder, f"image_{timestamp}.png")
-            cv2.imwrite(filename, frame)
-
     def set_threshold(self, value: float):
         self.image_pro.threshold_value = int(value)
         self.threshold_label.configure(text=f"Threshold: {int(value)}")
@@ -260,12 +303,14 @@ class DART:
     def set_pan(self, value: float):
         self.pan_value = int(value)
         self.pan_label.configure(text=f"Pan angle: {int(value)}")
+        self.last_move_time = time.perf_counter()
         angle = vm2.num_to_range(self.pan_value, -45, 45, 202.5, 247.5)
         self.dyna.set_pos(1, angle)
 
     def set_tilt(self, value: float):
         self.tilt_value = int(value)
         self.tilt_label.configure(text=f"Tilt angle: {int(value)}")
+        self.last_move_time = time.perf_counter()
         angle = vm2.num_to_range(self.tilt_value, -45, 45, 292.5, 337.5)
         self.dyna.set_pos(2, angle)
 
@@ -277,8 +322,9 @@ class DART:
             logging.error(f"Error closing QTM connection: {e}")
             
         try:
-            # Close the camera
+            # Stop the video threads before closing the camera
             self.is_live = False
+            self.video_pipeline.stop()
             self.camera_manager.release()
         except Exception as e:
             logging.error(f"Error closing camera or serial port: {e}")
@@ -297,6 +343,9 @@ class DART:
             except Exception as e:
                 logging.error(f"Error terminating track process: {e}")
 
+        # Free the shared frame ring once no process reads it
+        self.frame_ring.close()
+
         try:
             self.window.destroy()
         except Exception as e:
@@ -0,0 +1,172 @@
+from vec_math2 import LocalTransform
+from typing import Tuple
+import numpy as np
+import timeit
+import math
+
+# Geometric angle range (deg) -> Dynamixel angle range (deg) for each axis,
+# matching the num_to_range mapping used by DynaTracker
+PAN_MAP = (45, -45, 202.5, 247.5)
+TILT_MAP = (45, -45, 292.5, 337.5)
+
+# Encoder ticks per Dynamixel degree
+TICKS_PER_DEG = 4095 / 360
+
+
+class AimKernel:
+    """
+    Vectorised aiming kernel mapping global target points straight to Dynamixel ticks.
+
+    The global-to-local transform, pan/tilt decomposition, range mapping and tick
+    conversion of the scalar chain (global_to_local -> calc_rot_comp -> num_to_range ->
+    set_sync_pos) are folded into a single NumPy pass. The same kernel serves the live
+    loop (N=1), offline replay of recorded trajectories and multi-marker aiming.
+
+    Args:
+    transform (LocalTransform): Calibrated global-to-local transform.
+    pan_map (tuple): (in_min, in_max, out_min, out_max) pan mapping in degrees.
+    tilt_map (tuple): (in_min, in_max, out_min, out_max) tilt mapping in degrees.
+    """
+    def __init__(self, transform: LocalTransform, pan_map: Tuple[float, float, float, float] = PAN_MAP,
+                 tilt_map: Tuple[float, float, float, float] = TILT_MAP):
+        self.transform = transform
+
+        # Fold each linear mapping into ticks = scale * angle_rad + offset
+        scale = np.empty(2)
+        offset = np.empty(2)
+        lower = np.empty(2)
+        upper = np.empty(2)
+        for axis, (in_min, in_max, out_min, out_max) in enumerate((pan_map, tilt_map)):
+            slope = (out_max - out_min) / (in_max - in_min)
+            scale[axis] = math.degrees(1) * slope * TICKS_PER_DEG
+            offset[axis] = (out_min - in_min * slope) * TICKS_PER_DEG
+            lower[axis] = min(out_min, out_max) * TICKS_PER_DEG
+            upper[axis] = max(out_min, out_max) * TICKS_PER_DEG
+
+        self.scale = scale
+        self.offset = offset
+        self.lower = lower
+        self.upper = upper
+
+        # Plain float copies for the single-point path, where NumPy call overhead dominates
+        self._inverse_rows = tuple(tuple(row) for row in transform.inverse.tolist())
+        self._origin_offset = tuple(transform.offset.tolist())
+        self._axis_params = tuple(zip(scale.tolist(), offset.tolist(), lower.tolist(), upper.tolist()))
+
+    def to_ticks(self, points_global: np.ndarray) -> np.ndarray:
+        """
+        Map global points to clamped pan/tilt goal positions.
+
+        Args:
+        points_global (np.ndarray): (N, 3) target points in global coordinates.
+
+        Returns:
+        np.ndarray: (N, 2) int32 array of [pan, tilt] ticks.
+        """
+        local = self.transform.to_local_batch(np.asarray(points_global, dtype=float).reshape(-1, 3))
+        x, y, z = local[:, 0], local[:, 1], local[:, 2]
+
+        angles = np.empty((local.shape[0], 2))
+        np.arctan2(y, x, out=angles[:, 0])
+        np.arctan2(z, np.hypot(x, y), out=angles[:, 1])
+
+        # Linear map to ticks, then clamp to the mechanical range
+        angles *= self.scale
+        angles += self.offset
+        np.clip(angles, self.lower, self.upper, out=angles)
+
+        # astype truncates toward zero like int() in set_sync_pos
+        return angles.astype(np.int32)
+
+    def aim(self, point_global: np.ndarray) -> Tuple[int, int]:
+        """
+        Map a single global point to (pan, tilt) ticks for the live loop.
+
+        Args:
+        point_global (np.ndarray): Target point in global coordinates.
+
+        Returns:
+        Tuple[int, int]: The pan and tilt goal positions in ticks.
+        """
+        px, py, pz = point_global
+        (r00, r01, r02), (r10, r11, r12), (r20, r21, r22) = self._inverse_rows
+        ox, oy, oz = self._origin_offset
+        x = r00 * px + r01 * py + r02 * pz - ox
+        y = r10 * px + r11 * py + r12 * pz - oy
+        z = r20 * px + r21 * py + r22 * pz - oz
+
+        (pan_scale, pan_offset, pan_lower, pan_upper), (tilt_scale, tilt_offset, tilt_lower, tilt_upper) = self._axis_params
+        pan_ticks = min(max(math.atan2(y, x) * pan_scale + pan_offset, pan_lower), pan_upper)
+        tilt_ticks = min(max(math.atan2(z, math.hypot(x, y)) * tilt_scale + tilt_offset, tilt_lower), tilt_upper)
+        return int(pan_ticks), int(tilt_ticks)
+
+
+def ticks_to_angles(pan_ticks: float, tilt_ticks: float, pan_map: Tuple[float, float, float, float] = PAN_MAP,
+                    tilt_map: Tuple[float, float, float, float] = TILT_MAP) -> Tuple[float, float]:
+    """
+    Inverse of the kernel's angle-to-tick mapping, e.g. for present positions read back from the servos.
+
+    Args:
+    pan_ticks (float): Pan position in ticks.
+    tilt_ticks (float): Tilt position in ticks.
+    pan_map (tuple): (in_min, in_max, out_min, out_max) pan mapping in degrees.
+    tilt_map (tuple): (in_min, in_max, out_min, out_max) tilt mapping in degrees.
+
+    Returns:
+    Tuple[float, float]: Geometric pan and tilt angles in degrees.
+    """
+    angles = []
+    for ticks, (in_min, in_max, out_min, out_max) in ((pan_ticks, pan_map), (tilt_ticks, tilt_map)):
+        degrees = ticks / TICKS_PER_DEG
+        angles.append(in_min + (degrees - out_min) * (in_max - in_min) / (out_max - out_min))
+    return angles[0], angles[1]
+
+
+def scalar_chain(point_global: np.ndarray, local_origin: np.ndarray, rotation_matrix: np.ndarray) -> Tuple[int, int]:
+    """
+    Reference implementation of the original per-point chain, used for benchmarking.
+    """
+    def num_to_range(num, inMin, inMax, outMin, outMax):
+        return outMin + (float(num - inMin) / float(inMax - inMin) * (outMax - outMin))
+
+    point_local = np.dot(np.linalg.inv(rotation_matrix), np.array(point_global) - local_origin)
+    pan_angle = math.degrees(math.atan2(point_local[1], point_local[0]))
+    tilt_angle = math.degrees(math.atan2(point_local[2], math.sqrt(point_local[0]**2 + point_local[1]**2)))
+    pan_angle = num_to_range(pan_angle, *PAN_MAP)
+    tilt_angle = num_to_range(tilt_angle, *TILT_MAP)
+    return int(pan_angle * 4095 / 360), int(tilt_angle * 4095 / 360)
+
+
+def benchmark(num_points: int = 10000, repeats: int = 5) -> None:
+    """
+    Compare the scalar chain against the kernel for single points and batches.
+    """
+    rng = np.random.default_rng(0)
+
+    # Arbitrary orthonormal calibration and targets in front of the rig
+    rotation_matrix, _ = np.linalg.qr(rng.normal(size=(3, 3)))
+    local_origin = np.array([-90.0, 400.0, 660.0])
+    directions = np.column_stack((np.ones(num_points), rng.uniform(-0.8, 0.8, (num_points, 2))))
+    points = local_origin + (directions * rng.uniform(500, 3000, (num_points, 1))) @ rotation_matrix.T
+    point_lists = points.tolist()
+
+    kernel = AimKernel(LocalTransform(local_origin, rotation_matrix))
+
+    # Sanity check: results agree to within one tick of truncation error
+    reference = np.array([scalar_chain(p, local_origin, rotation_matrix) for p in point_lists[:1000]])
+    max_diff = max(np.abs(kernel.to_ticks(points[:1000]) - reference).max(),
+                   np.abs(np.array([kernel.aim(p) for p in point_lists[:1000]]) - reference).max())
+
+    chain_time = min(timeit.repeat(lambda: [scalar_chain(p, local_origin, rotation_matrix) for p in point_lists],
+                                   number=1, repeat=repeats))
+    single_time = min(timeit.repeat(lambda: [kernel.aim(p) for p in point_lists], number=1, repeat=repeats))
+    batch_time = min(timeit.repeat(lambda: kernel.to_ticks(points), number=1, repeat=repeats))
+
+    print(f"Max tick difference vs scalar chain: {max_diff}")
+    print(f"Scalar chain:     {chain_time / num_points * 1e6:8.3f} us/point")
+    print(f"Kernel, N=1:      {single_time / num_points * 1e6:8.3f} us/point")
+    print(f"Kernel, N={num_points}: {batch_time / num_points * 1e6:8.3f} us/point")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,188 @@
+from threading import Thread, Event
+from typing import Callable, List, Optional
+from collections import namedtuple
+import numpy as np
+import logging
+import pickle
+import zlib
+import time
+import os
+
+CALIB_MAGIC = b'DCAL'
+CALIB_VERSION = 1
+
+# Fixed binary record stored as a one-element .npy file; the CRC covers everything after it
+CALIB_DTYPE = np.dtype([
+    ('magic', 'S4'),
+    ('version', '<u4'),
+    ('crc32', '<u4'),
+    ('timestamp', '<f8'),
+    ('local_origin', '<f8', 3),
+    ('rotation_matrix', '<f8', (3, 3)),
+])
+_CRC_OFFSET = CALIB_DTYPE.fields['timestamp'][1]
+
+DEFAULT_DIRECTORY = os.path.join('config', 'calib')
+LEGACY_PATH = os.path.join('config', 'calib_data.pkl')
+
+Calibration = namedtuple('Calibration', ['local_origin', 'rotation_matrix', 'timestamp', 'version'])
+
+
+class CalibrationError(Exception):
+    pass
+
+
+class CalibStore:
+    '''
+    Named calibration profiles stored as fixed-layout records in .npy files.
+
+    Each profile is one CALIB_DTYPE record with a magic tag, schema version, save time
+    and CRC32 of its payload. Loading memory-maps the file and checks these fields
+    without unpickling anything. Saves go to a temporary file that is then renamed over
+    the profile, so a reader or watcher never sees a half-written record.
+
+    Parameters:
+    - directory (str): Folder holding one <profile>.npy per profile.
+    '''
+    def __init__(self, directory: str = DEFAULT_DIRECTORY) -> None:
+        self.directory = directory
+
+    def path(self, profile: str) -> str:
+        return os.path.join(self.directory, f'{profile}.npy')
+
+    def profiles(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[:-4] for name in os.listdir(self.directory) if name.endswith('.npy'))
+
+    def exists(self, profile: str = 'default') -> bool:
+        return os.path.exists(self.path(profile))
+
+    def save(self, local_origin: np.ndarray, rotation_matrix: np.ndarray, profile: str = 'default') -> str:
+        '''
+        Write a calibration to a profile atomically.
+
+        Returns:
+        - str: Path of the profile file.
+        '''
+        record = np.zeros(1, dtype=CALIB_DTYPE)
+        record['magic'] = CALIB_MAGIC
+        record['version'] = CALIB_VERSION
+        record['timestamp'] = time.time()
+        record['local_origin'] = local_origin
+        record['rotation_matrix'] = rotation_matrix
+        record['crc32'] = zlib.crc32(record.tobytes()[_CRC_OFFSET:])
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(profile)
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as f:
+            np.save(f, record)
+
+        # On Windows the rename fails while another process briefly has the old file mapped
+        for attempt in range(10):
+            try:
+                os.replace(temp_path, path)
+                break
+            except PermissionError:
+                if attempt == 9:
+                    raise
+                time.sleep(0.01)
+        logging.info(f"Calibration profile '{profile}' saved to {path}")
+        return path
+
+    def load(self, profile: str = 'default') -> Calibration:
+        '''
+        Load and verify a profile.
+
+        Raises:
+        - CalibrationError: If the profile is missing, of another schema version or corrupt.
+        '''
+        path = self.path(profile)
+        try:
+            record = np.load(path, mmap_mode='r')
+        except (OSError, ValueError) as e:
+            raise CalibrationError(f"Cannot read calibration profile '{profile}' at {path}: {e}") from e
+
+        if record.dtype != CALIB_DTYPE or record.shape != (1,):
+            raise CalibrationError(f"Calibration profile '{profile}' has an unexpected layout.")
+        record = record[0]
+        if record['magic'] != CALIB_MAGIC:
+            raise CalibrationError(f"{path} is not a calibration file.")
+        if record['version'] != CALIB_VERSION:
+            raise CalibrationError(f"Calibration profile '{profile}' has schema version {record['version']}, expected {CALIB_VERSION}.")
+        if zlib.crc32(record.tobytes()[_CRC_OFFSET:]) != record['crc32']:
+            raise CalibrationError(f"Calibration profile '{profile}' failed its checksum.")
+
+        return Calibration(np.array(record['local_origin']), np.array(record['rotation_matrix']),
+                           float(record['timestamp']), int(record['version']))
+
+    def mtime(self, profile: str = 'default') -> Optional[int]:
+        try:
+            return os.stat(self.path(profile)).st_mtime_ns
+        except OSError:
+            return None
+
+    def migrate_legacy(self, legacy_path: str = LEGACY_PATH, profile: str = 'default') -> bool:
+        '''
+        Convert the old pickled (local_origin, rotation_matrix) file into a profile if that profile does not exist yet.
+
+        Returns:
+        - bool: True if a profile was written.
+        '''
+        if self.exists(profile) or not os.path.exists(legacy_path):
+            return False
+        with open(legacy_path, 'rb') as f:
+            local_origin, rotation_matrix = pickle.load(f)
+        self.save(local_origin, rotation_matrix, profile)
+        logging.info(f"Migrated {legacy_path} to calibration profile '{profile}'")
+        return True
+
+
+class CalibWatcher(Thread):
+    '''
+    Poll a profile's modification time and reload it when it changes, so a running tracker picks up a new calibration.
+
+    Parameters:
+    - store (CalibStore): Store holding the profile.
+    - profile (str): Profile to watch.
+    - on_change (Callable[[Calibration], None]): Called from this thread with each newly loaded calibration.
+    - interval (float): Seconds between checks; each check is a single stat call.
+    '''
+    def __init__(self, store: CalibStore, profile: str, on_change: Callable[[Calibration], None], interval: float = 0.5) -> None:
+        Thread.__init__(self, daemon=True)
+        self.store = store
+        self.profile = profile
+        self.on_change = on_change
+        self.interval = interval
+        self._mtime = store.mtime(profile)
+        self._stop_event = Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            mtime = self.store.mtime(self.profile)
+            if mtime is None or mtime == self._mtime:
+                continue
+            try:
+                calibration = self.store.load(self.profile)
+            except CalibrationError as e:
+                logging.error(f"Ignoring calibration update: {e}")
+                continue
+            self._mtime = mtime
+            logging.info(f"Calibration profile '{self.profile}' reloaded")
+            self.on_change(calibration)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+
+    store = CalibStore()
+    store.migrate_legacy()
+    for profile in store.profiles():
+        calibration = store.load(profile)
+        print(f"{profile}: saved {time.ctime(calibration.timestamp)}\n"
+              f"  origin {calibration.local_origin}\n  rotation {calibration.rotation_matrix.tolist()}")
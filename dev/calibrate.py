@@ -1,33 +1,46 @@
 import os
-import pickle
 import logging
 import math
 import numpy as np
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
-from typing import Tuple
+from vec_math2 import LocalTransform, intersect_lines, beam_directions, fit_rotation
+from calib_store import CalibStore, CalibrationError
+from collections import namedtuple
+from typing import Optional, Tuple
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 
+# Fit quality of a streaming calibration: line distances to the origin (mm) and beam direction errors (deg)
+CalibrationReport = namedtuple('CalibrationReport', ['num_samples', 'line_rms', 'line_max', 'angle_rms', 'angle_max'])
+
 class Calibrator:
-    def __init__(self):
+    def __init__(self, profile: str = 'default'):
         self.positions = []
         self.rotation_matrix = None
         self.local_origin = None
+        self.transform = None
         self.calibration_step = 0
         self.calibrated = False
 
-        # Load calibration data if it exists
-        calib_data_path = 'config/calib_data.pkl'
-        if os.path.exists(calib_data_path):
-            with open(calib_data_path, 'rb') as f:
-                self.local_origin, self.rotation_matrix = pickle.load(f)
-                self.calibrated = True
-                logging.info("Calibration data loaded successfully.")
-                print(f"Local origin: {self.local_origin}")
-        else:
-            logging.info("No calibration data found.")
+        # Streaming calibration samples: marker pair on the beam and the commanded pan/tilt
+        self.samples = []
+        self.report = None
+
+        # Load calibration data if it exists, converting the old pickle on first use
+        self.profile = profile
+        self.store = CalibStore()
+        self.store.migrate_legacy()
+        try:
+            calibration = self.store.load(profile)
+            self.local_origin, self.rotation_matrix = calibration.local_origin, calibration.rotation_matrix
+            self.transform = LocalTransform(self.local_origin, self.rotation_matrix)
+            self.calibrated = True
+            logging.info("Calibration data loaded successfully.")
+            print(f"Local origin: {self.local_origin}")
+        except CalibrationError as e:
+            logging.info(f"No calibration data found: {e}")
 
     def run(self, p1: np.ndarray, p2: np.ndarray):
         self.positions.append(p1)
@@ -61,11 +74,81 @@ class Calibrator:
         y_axis = np.cross(x_axis, z_axis)  # Recompute to ensure orthogonality
 
         self.rotation_matrix = np.column_stack((x_axis, y_axis, z_axis))
-
-        os.makedirs('config', exist_ok=True)  # Ensure the config directory exists
-        with open('config/calib_data.pkl', 'wb') as f:
-            pickle.dump((self.local_origin, self.rotation_matrix), f)
-            logging.info("Calibration data saved successfully.")
+        self.transform = LocalTransform(self.local_origin, self.rotation_matrix)
+
+        self.save()
+
+    def save(self):
+        self.store.save(self.local_origin, self.rotation_matrix, self.profile)
+        logging.info("Calibration data saved successfully.")
+
+    def add_sample(self, p1: np.ndarray, p2: np.ndarray, pan: float, tilt: float):
+        '''
+        Record one streaming calibration sample.
+
+        p1 and p2 are two markers on the beam; pan and tilt are the geometric angles
+        (degrees, tracker convention) the mirrors were commanded to when it was taken.
+        '''
+        self.samples.append(np.concatenate((p1, p2, (pan, tilt))))
+
+    def clear_samples(self):
+        self.samples = []
+        self.report = None
+
+    def beam_lines(self) -> Tuple[np.ndarray, np.ndarray]:
+        '''
+        (origins, directions) of the beam lines through the recorded marker pairs, for
+        intersect_lines or the lines argument of the vec_math2 origin solvers.
+        '''
+        samples = np.array(self.samples)
+        return samples[:, 0:3], samples[:, 3:6] - samples[:, 0:3]
+
+    def solve_samples(self, min_samples: int = 4, save: bool = True) -> Optional[CalibrationReport]:
+        '''
+        Calibrate from every streamed sample in one least-squares step.
+
+        The local origin is the point closest to all beam lines. The axes are the
+        rotation that best maps the commanded beam directions onto the measured ones
+        (SVD fit), so the frame matches the tracker's pan/tilt convention by construction.
+        '''
+        if len(self.samples) < min_samples:
+            logging.warning(f"{len(self.samples)} calibration samples recorded; at least {min_samples} needed.")
+            return None
+
+        samples = np.array(self.samples)
+        p1, p2, pan, tilt = samples[:, 0:3], samples[:, 3:6], samples[:, 6], samples[:, 7]
+
+        try:
+            local_origin = intersect_lines(*self.beam_lines())
+
+            # Beam directions from the origin toward each marker pair
+            measured = (p1 + p2) / 2 - local_origin
+            measured /= np.linalg.norm(measured, axis=1)[:, None]
+            commanded = beam_directions(pan, tilt)
+            rotation_matrix = fit_rotation(commanded, measured)
+        except (ValueError, np.linalg.LinAlgError) as e:
+            logging.error(f"Calibration failed: {e}")
+            return None
+
+        # Residuals: distance of each beam line from the origin, and direction error
+        directions = (p2 - p1) / np.linalg.norm(p2 - p1, axis=1)[:, None]
+        offsets = p1 - local_origin
+        line_distances = np.linalg.norm(offsets - np.einsum('ij,ij->i', offsets, directions)[:, None] * directions, axis=1)
+        cosines = np.clip(np.einsum('ij,ij->i', commanded @ rotation_matrix.T, measured), -1.0, 1.0)
+        angle_errors = np.degrees(np.arccos(cosines))
+
+        self.report = CalibrationReport(len(samples), float(np.sqrt(np.mean(line_distances ** 2))), float(line_distances.max()),
+                                        float(np.sqrt(np.mean(angle_errors ** 2))), float(angle_errors.max()))
+        logging.info(f"Calibration from {self.report.num_samples} samples: line RMS {self.report.line_rms:.2f} mm "
+                     f"(max {self.report.line_max:.2f}), direction RMS {self.report.angle_rms:.3f} deg (max {self.report.angle_max:.3f})")
+
+        self.local_origin = local_origin
+        self.rotation_matrix = rotation_matrix
+        self.transform = LocalTransform(self.local_origin, self.rotation_matrix)
+        self.calibrated = True
+        if save:
+            self.save()
+        return self.report
 
     def find_closest_points(self, p1: np.ndarray, p2: np.ndarray, p3: np.ndarray, p4: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
         d1 = p2 - p1
@@ -89,9 +172,9 @@ class Calibrator:
         return (point1 + point2) / 2
 
     def global_to_local(self, point_global: np.ndarray) -> np.ndarray:
-        if self.rotation_matrix is None:
+        if self.transform is None:
             raise ValueError("Calibration must be completed before transforming points.")
-        return np.dot(np.linalg.inv(self.rotation_matrix), point_global - self.local_origin)
+        return self.transform.to_local(point_global)
 
     def calc_rot_comp(self, point_local: np.ndarray) -> Tuple[float, float]:
         pan_angle = math.degrees(math.atan2(point_local[1], point_local[0]))
@@ -1,13 +1,149 @@
-from threading import Thread
-from queue import Queue
+from threading import Condition
+from recorder import FrameRecorder
+from typing import Optional, Tuple
+import numpy as np
 import os, time, sys
 import EasyPySpin
+import PySpin
 import logging
-import cv2 
+import cv2
+
+class FrameBufferRing:
+    """
+    Preallocated ring of camera frames that capture writes into and consumers borrow by index.
+
+    All buffers are allocated once, on the first frame, so memory stays flat however
+    fast the camera runs. borrow_latest() and borrow_next() hand out a slot index and
+    bump its reference count; frame(index) is a view into the ring, not a copy, and
+    stays valid until release(index). Capture never writes into a borrowed slot.
+
+    When capture needs a slot the policy decides what gives way:
+    - 'overwrite': reuse the oldest slot nobody is borrowing, even if no consumer has
+      seen it yet. Live display uses this so it always gets the newest frame.
+    - 'drop': only reuse slots a consumer has already borrowed. If every slot still
+      holds an unseen frame the new frame is dropped instead. Recording uses this so
+      every frame it does get is written.
+    :param num_buffers: Number of frame buffers
+    :param policy: 'overwrite' or 'drop'
+    """
+    def __init__(self, num_buffers: int = 8, policy: str = 'overwrite'):
+        if policy not in ('overwrite', 'drop'):
+            raise ValueError(f"Unknown ring policy: {policy}")
+        self.num_buffers = num_buffers
+        self.policy = policy
+
+        self.buffers = None
+        self.refcounts = np.zeros(num_buffers, dtype=np.int64)
+        self.frame_numbers = np.full(num_buffers, -1, dtype=np.int64)
+        self.timestamps = np.zeros(num_buffers)                        # Host time.perf_counter() at capture (s)
+        self.device_timestamps = np.zeros(num_buffers, dtype=np.int64) # Camera clock (ns), 0 if unknown
+        self.unread = np.zeros(num_buffers, dtype=bool)
+
+        self.count = 0        # Frames committed so far
+        self.dropped = 0      # Frames dropped because no slot was free or the ring could not be resized
+        self.overwritten = 0  # Unseen frames overwritten under the 'overwrite' policy
+        self._cond = Condition()
+
+    def allocate(self, shape: Tuple[int, ...], dtype=np.uint8) -> None:
+        """
+        (Re)allocate the buffers for a frame shape; only done when the shape changes.
+        """
+        with self._cond:
+            if self.buffers is not None and self.buffers.shape[1:] == tuple(shape) and self.buffers.dtype == dtype:
+                return
+            if self.refcounts.any():
+                raise RuntimeError("Cannot reallocate the frame ring while frames are borrowed.")
+            self.buffers = np.empty((self.num_buffers,) + tuple(shape), dtype=dtype)
+            self.frame_numbers[:] = -1
+            self.unread[:] = False
+
+    def claim(self) -> Optional[int]:
+        """
+        Slot for the next frame, chosen by the policy. Called by the single capture thread.
+        :return: Slot index to write into, or None if the frame must be dropped
+        """
+        with self._cond:
+            # Oldest slot first, so readers lose as little history as possible
+            order = np.argsort(self.frame_numbers, kind='stable')
+            free = order[self.refcounts[order] == 0]
+            if self.policy == 'drop':
+                free = free[~self.unread[free]]
+            if not len(free):
+                self.dropped += 1
+                return None
+            index = int(free[0])
+            if self.unread[index]:
+                self.overwritten += 1
+            self.unread[index] = False
+            self.frame_numbers[index] = -1
+            return index
+
+    def commit(self, index: int, timestamp: float, device_timestamp: int = 0) -> int:
+        """
+        Publish a claimed slot once its buffer holds the new frame.
+        :return: Frame number given to the frame
+        """
+        with self._cond:
+            frame_number = self.count
+            self.frame_numbers[index] = frame_number
+            self.timestamps[index] = timestamp
+            self.device_timestamps[index] = device_timestamp
+            self.unread[index] = True
+            self.count += 1
+            self._cond.notify_all()
+            return frame_number
+
+    def borrow_latest(self, after: int = -1, timeout: Optional[float] = None) -> Optional[int]:
+        """
+        Borrow the newest frame if it is newer than frame number after.
+        :param timeout: Seconds to wait for one, None to return immediately
+        :return: Slot index, or None if there is no newer frame
+        """
+        with self._cond:
+            if timeout is not None:
+                self._cond.wait_for(lambda: self.count - 1 > after, timeout)
+            newest = int(np.argmax(self.frame_numbers))
+            if self.frame_numbers[newest] <= after:
+                return None
+            return self._borrow(newest)
+
+    def borrow_next(self, timeout: Optional[float] = None) -> Optional[int]:
+        """
+        Borrow the oldest frame no consumer has borrowed yet.
+        :param timeout: Seconds to wait for one, None to return immediately
+        :return: Slot index, or None if every frame has been seen
+        """
+        with self._cond:
+            if timeout is not None:
+                self._cond.wait_for(lambda: self.unread.any(), timeout)
+            unread = np.flatnonzero(self.unread)
+            if not len(unread):
+                return None
+            return self._borrow(int(unread[np.argmin(self.frame_numbers[unread])]))
+
+    def _borrow(self, index: int) -> int:
+        self.refcounts[index] += 1
+        self.unread[index] = False
+        return index
+
+    def release(self, index: int) -> None:
+        with self._cond:
+            if self.refcounts[index] <= 0:
+                raise ValueError(f"Frame buffer {index} is not borrowed.")
+            self.refcounts[index] -= 1
+
+    def frame(self, index: int) -> np.ndarray:
+        """
+        View of a slot's pixels; only valid while the slot is borrowed or being written.
+        """
+        return self.buffers[index]
+
 
 class CameraManager:
-    def __init__(self):
+    def __init__(self, num_buffers: int = 8, policy: str = 'overwrite', grab_timeout: int = 500):
         self.cap = None
+        self.grab_timeout = grab_timeout  # ms
+        self.ring = FrameBufferRing(num_buffers, policy)
         self.initialize_camera()
         self.image_folder = "images"
 
@@ -24,6 +160,8 @@ class CameraManager:
 
     def configure_camera(self):
         if self.cap and self.cap.isOpened():
+            # Bounded wait for each frame so capture threads can be stopped
+            self.cap.grabTimeout = self.grab_timeout
             desired_width, desired_height = 960, 720
             self.set_camera_properties(desired_width, desired_height)
             self.center_roi_on_sensor(desired_width, desired_height)
@@ -52,42 +190,95 @@ class CameraManager:
         try:
             if self.cap and self.cap.isOpened():
                 return self.cap.read()
-        except _PySpin.SpinnakerException as e:
+        except PySpin.SpinnakerException as e:
             logging.error(f"Error reading frame: {e}")
             # Implement reconnection logic or notify the user
         return False, None
 
+    def grab(self) -> Optional[int]:
+        """
+        Capture the next frame straight into the ring.
+
+        The Spinnaker image is copied once into a preallocated slot and handed back to
+        the driver; no per-frame array is allocated. Falls back to read() if the
+        capture has no Spinnaker camera handle.
+        :return: Frame number of the committed frame, or None if nothing was captured or the ring was full
+        """
+        if not (self.cap and self.cap.isOpened()):
+            return None
+
+        device_timestamp = 0
+        try:
+            cam = getattr(self.cap, 'cam', None)
+            if cam is not None:
+                # Same acquisition start and timeout as EasyPySpin's read()
+                if not cam.IsStreaming():
+                    cam.BeginAcquisition()
+                image = cam.GetNextImage(self.cap.grabTimeout)
+                try:
+                    if image.IsIncomplete():
+                        return None
+                    timestamp = time.perf_counter()
+                    device_timestamp = image.GetTimeStamp()
+                    return self._store(image.GetNDArray(), timestamp, device_timestamp)
+                finally:
+                    image.Release()
+
+            ret, frame = self.cap.read()
+            if not ret:
+                return None
+            return self._store(frame, time.perf_counter(), device_timestamp)
+        except PySpin.SpinnakerException as e:
+            logging.error(f"Error reading frame: {e}")
+            return None
+
+    def _store(self, frame: np.ndarray, timestamp: float, device_timestamp: int) -> Optional[int]:
+        try:
+            self.ring.allocate(frame.shape, frame.dtype)
+        except RuntimeError as e:
+            # Frame shape changed while consumers still hold old frames; drop until they are released
+            logging.warning(f"Dropping frame: {e}")
+            self.ring.dropped += 1
+            return None
+        index = self.ring.claim()
+        if index is None:
+            return None
+        np.copyto(self.ring.frame(index), frame)
+        return self.ring.commit(index, timestamp, device_timestamp)
+
     def release(self):
         if self.cap:
             self.cap.release()
 
-def write_images(q, camera_manager):
-    while True:
-        frame, filename = q.get()
-        cv2.imwrite(filename, frame)
-        q.task_done()
+def camera_record(policy: str = 'drop_oldest', num_workers: int = 2, queue_size: int = 16, container: bool = True):
+    logging.basicConfig(level=logging.INFO)
 
-def camera_record():
-    logging.basicConfig(level=logging.ERROR)
-    camera_manager = CameraManager()
-    q = Queue()
-    writer = Thread(target=write_images, args=(q, camera_manager))
-    writer.daemon = True
-    writer.start()
+    # Queued frames stay in the ring until written, so it needs a slot for each plus the ones being captured and written.
+    # A container recorder runs a single worker whatever num_workers asks for, so size from the workers it started.
+    # 'drop' never overwrites a frame before the recorder has borrowed it; a full ring drops the new frame instead.
+    recorder = FrameRecorder("images", num_workers=num_workers, queue_size=queue_size, policy=policy, container=container)
+    camera_manager = CameraManager(num_buffers=queue_size + len(recorder.workers) * recorder.batch_size + 2, policy='drop')
+    ring = camera_manager.ring
 
     try:
         while True:
-            _, frame = camera_manager.read_frame()
-            timestamp = time.strftime("%Y%m%d-%H%M%S")
-            filename = os.path.join(camera_manager.image_folder, f"image_{timestamp}.bmp")
-            q.put((frame, filename))
+            frame_number = camera_manager.grab()
+            if frame_number is None:
+                continue
+            index = ring.borrow_latest(frame_number - 1)
+            if index is None:
+                continue
+            recorder.submit(ring.frame(index), frame_id=frame_number, timestamp=ring.timestamps[index],
+                            release=lambda index=index: ring.release(index))
 
     except KeyboardInterrupt:
+        recorder.close()
         camera_manager.release()
-        print("Camera released successfully\n")
+        print(f"Camera released successfully, {ring.dropped + recorder.dropped} frames dropped\n")
         sys.exit(0)
 
     except Exception as e:
+        recorder.close()
         camera_manager.release()
         print(f"An error occurred: {e}")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
@@ -1,10 +1,18 @@
 from dyna_controller import *
+from loop_scheduler import LoopScheduler
 from importlib import reload
 from mocap_stream import *
+from shm_ring import SharedMocapSource
+from marker_tracker import MarkerTracker
+from marker_fusion import MarkerFusion
+from predictor import TargetPredictor, estimate_look_ahead
+from vec_math2 import LocalTransform
+from aim_kernel import AimKernel, ticks_to_angles
+from online_calib import OnlineCalibrator
+from calib_store import CalibStore, CalibWatcher, Calibration
 import numpy as np
 import cProfile
 import logging
-import pickle
 import time
 
 
@@ -16,33 +24,81 @@ class DynaTracker:
     the computer via USB and that the QTM mocap system is running and streaming
     data.
     - In QTM align
+    - If ring_name is given, frames are read from the shared memory ring filled by
+    the GUI's MoCap instead of opening another QTM connection.
+    - The servos aim look_ahead seconds ahead of the latest frame to cancel system
+    latency; by default it is estimated from the get_theta_bode sweeps in data/.
+    - With refine_calibration, the calibration is refined in the background from the
+    second (calibration) marker whenever it is held in the beam while tracking. A frame
+    only becomes an observation if that marker was seen in it and the servos or the
+    marker have moved since the last observation, so a still pose cannot fill the window.
     '''
-    def __init__(self, com_port='COM5'):
-        # Load calibration data if it exists
-        if os.path.exists('config\calib_data.pkl'):
-            with open('config\calib_data.pkl', 'rb') as f:
-                self.local_origin, self.rotation_matrix = pickle.load(f)
-                logging.info("Calibration data loaded successfully.")
+    def __init__(self, com_port='COM5', ring_name: Optional[str] = None, look_ahead: Optional[float] = None,
+                 refine_calibration: bool = False, profile: str = 'default'):
+        # Load calibration data; raises CalibrationError if the profile is missing or corrupt
+        store = CalibStore()
+        store.migrate_legacy()
+        calibration = store.load(profile)
+        self.local_origin, self.rotation_matrix = calibration.local_origin, calibration.rotation_matrix
+        self.transform = LocalTransform(self.local_origin, self.rotation_matrix)
+        self.aim_kernel = AimKernel(self.transform)
+        logging.info("Calibration data loaded successfully.")
+
+        # Follow the shared frame ring if there is one, otherwise connect to QTM directly
+        if ring_name is not None:
+            self.target = SharedMocapSource(ring_name)
         else:
-            logging.error("No calibration data found.")
-            quit()
-
-        # Connect to QTM; init tracker and target
-        self.target = MoCap(stream_type='3d')
-        time.sleep(0.1)
+            self.target = MoCap(stream_type='3d', fusion=MarkerFusion(), marker_tracker=MarkerTracker())
+            self.target.calibration_target = refine_calibration
+            time.sleep(0.1)
+
+        # Extrapolate the target past the mocap, bus and servo latency
+        if look_ahead is None:
+            look_ahead = estimate_look_ahead()
+        self.predictor = TargetPredictor(look_ahead)
+
+        # Background calibration refinement; publishes by swapping the aim kernel reference
+        self.online_calibrator = None
+        if refine_calibration:
+            self.online_calibrator = OnlineCalibrator(self.transform, self.publish_transform)
+            self.online_calibrator.start()
+
+        # Last observation's pan/tilt (deg) and calibration marker, and the change needed for a new one
+        self.last_observation = None
+        self.observation_angle_step = 0.5
+        self.observation_distance_step = 10.0
+
+        # Pick up recalibrations saved while tracking
+        self.calib_watcher = CalibWatcher(store, profile, self.reload_calibration)
+        self.calib_watcher.start()
+
+        # Last QTM frame acted on and count of frames that arrived between iterations
+        self.last_frame_number = None
+        self.frames_skipped = 0
 
         # Create dynamixel controller object and open serial port
         self.dyna = DynaController(com_port)
-        self.dyna.open_port()
+        self.dyna.open_port(retries=5)
         
         # Default init operating mode into position
         self.dyna.set_op_mode(self.dyna.pan_id, 3)
         self.dyna.set_op_mode(self.dyna.tilt_id, 3)
 
+    def publish_transform(self, transform: LocalTransform) -> None:
+        # Build the new kernel first; track() picks up the single reference on its next call
+        self.aim_kernel = AimKernel(transform)
+        self.transform = transform
+
+    def reload_calibration(self, calibration: Calibration) -> None:
+        transform = LocalTransform(calibration.local_origin, calibration.rotation_matrix)
+        self.publish_transform(transform)
+        if self.online_calibrator is not None:
+            self.online_calibrator.transform = transform
+
     def global_to_local(self, point_global: np.ndarray) -> np.ndarray:
-        if self.rotation_matrix is None:
+        if self.transform is None:
             raise ValueError("Calibration must be completed before transforming points.")
-        return np.dot(np.linalg.inv(self.rotation_matrix), point_global - self.local_origin)
+        return self.transform.to_local(point_global)
 
     def calc_rot_comp(self, point_local: np.ndarray) -> Tuple[float, float]:
         pan_angle = math.degrees(math.atan2(point_local[1], point_local[0]))
@@ -52,35 +108,85 @@ class DynaTracker:
     def num_to_range(self, num, inMin, inMax, outMin, outMax):
         return outMin + (float(num - inMin) / float(inMax - inMin) * (outMax - outMin))
 
-    def track(self):
-        if self.target.lost:
-            logging.info("Target lost. Skipping iteration.")
-            return
-        
-        logging.info("Tracking target.")
-        
-        # Get the target position
-        target_pos = self.target.position
+    def track(self, timeout: float = 0.1) -> bool:
+        '''
+        Aim at the target for the next unseen QTM frame.
 
-        # Get the local target position
-        local_target_pos = self.global_to_local(target_pos)
+        Parameters:
+        - timeout (float): Seconds to wait for a new frame; 0 polls without blocking.
 
-        # Calculate the pan and tilt components of rotation from the positive X-axis
-        pan_angle, tilt_angle = self.calc_rot_comp(local_target_pos)
+        Returns:
+        - bool: True if a servo command was sent for a new frame.
+        '''
+        frame = self.target.wait_for_frame(self.last_frame_number, timeout)
+        if frame is None:
+            return False
 
-        # Convert geometric angles to dynamixel angles
-        pan_angle = self.num_to_range(pan_angle, 45, -45, 202.5, 247.5)
-        tilt_angle = self.num_to_range(tilt_angle, 45, -45, 292.5, 337.5)
+        if self.last_frame_number is not None and frame.frame_number > self.last_frame_number + 1:
+            self.frames_skipped += frame.frame_number - self.last_frame_number - 1
+        self.last_frame_number = frame.frame_number
 
-        # print(f"Pan angle: {pan_angle}, Tilt angle: {tilt_angle}")
-        # Set the dynamixel to the calculated angles
-        self.dyna.set_sync_pos(pan_angle, tilt_angle)
+        if frame.lost:
+            logging.info("Target lost. Skipping iteration.")
+            return False
+        
+        logging.info("Tracking target.")
+        
+        # Aim where the target will be once the command takes effect
+        self.predictor.update(frame.timestamp, frame.position)
+        target_position = self.predictor.predict()
+
+        # Map the global target position straight to clamped pan/tilt goal ticks
+        pan_ticks, tilt_ticks = self.aim_kernel.aim(target_position)
+
+        # print(f"Pan ticks: {pan_ticks}, Tilt ticks: {tilt_ticks}")
+        # Set the dynamixel to the calculated positions
+        if self.online_calibrator is None:
+            self.dyna.set_sync_ticks(pan_ticks, tilt_ticks)
+            return True
+
+        # Read the present state back for calibration refinement
+        self.dyna.set_sync_ticks(pan_ticks, tilt_ticks)
+        telemetry = self.dyna.get_sync_telemetry()
+        if telemetry is not None and abs(telemetry[0].velocity) <= 1 and abs(telemetry[1].velocity) <= 1:
+            pan, tilt = ticks_to_angles(telemetry[0].position, telemetry[1].position)
+            self.add_observation(frame.position2, pan, tilt)
+        return True
+
+    def add_observation(self, point: np.ndarray, pan: float, tilt: float) -> bool:
+        '''
+        Pass the calibration marker to the online calibrator if it is a new observation.
+
+        Parameters:
+        - point (np.ndarray): Calibration marker position; NaN or all zeros if it was not seen.
+        - pan (float): Geometric pan angle reported by the servos (deg).
+        - tilt (float): Geometric tilt angle reported by the servos (deg).
+
+        Returns:
+        - bool: True if the observation was added.
+        '''
+        point = np.asarray(point, dtype=float)
+        if not np.isfinite(point).all() or not point.any():
+            return False
+
+        if self.last_observation is not None:
+            last_pan, last_tilt, last_point = self.last_observation
+            turned = max(abs(pan - last_pan), abs(tilt - last_tilt)) >= self.observation_angle_step
+            moved = np.linalg.norm(point - last_point) >= self.observation_distance_step
+            if not (turned or moved):
+                return False
+
+        self.online_calibrator.add_observation(point, pan, tilt)
+        self.last_observation = (pan, tilt, point.copy())
+        return True
 
 
     def shutdown(self) -> None:
-        self.target._close()
-    
-        # Close QTM connections
+        self.calib_watcher.stop()
+        if self.online_calibrator is not None:
+            self.online_calibrator.stop()
+
+        # Close QTM connection or detach from the shared frame ring
         self.target.close()
 
         # Close serial port
@@ -88,21 +194,31 @@ class DynaTracker:
 
         return
 
-def dart_track():
+def dart_track(rate_hz: float = 500, event_driven: bool = True, ring_name: Optional[str] = None,
+               refine_calibration: bool = False, profile: str = 'default'):
     reload(logging)
     logging.basicConfig(level=logging.ERROR)
 
     set_realtime_priority()
 
-    dyna_tracker = DynaTracker()
+    dyna_tracker = DynaTracker(ring_name=ring_name, refine_calibration=refine_calibration, profile=profile)
+
+    # Fixed-rate mode polls for new frames at rate_hz; event-driven mode wakes on each QTM packet
+    scheduler = LoopScheduler(rate_hz)
     
     try:
 
         while True:
-            dyna_tracker.track()
-            # time.sleep(0.03)
+            if event_driven:
+                dyna_tracker.track()
+            else:
+                dyna_tracker.track(timeout=0)
+                scheduler.wait()
 
     except KeyboardInterrupt:
+        if not event_driven:
+            print(scheduler.format_stats())
+        print(f"Frames skipped: {dyna_tracker.frames_skipped}")
         dyna_tracker.shutdown()
         print("Port closed successfully\n")
         sys.exit(0)
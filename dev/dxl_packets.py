@@ -0,0 +1,122 @@
+from dynamixel_sdk import COMM_SUCCESS, COMM_TX_FAIL, COMM_PORT_BUSY, BROADCAST_ID, INST_SYNC_WRITE
+from typing import List
+import struct
+
+
+def _make_crc_table() -> List[int]:
+    # CRC-16 (IBM, polynomial 0x8005) table used by Dynamixel Protocol 2.0
+    table = []
+    for i in range(256):
+        crc = i << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x8005) if crc & 0x8000 else (crc << 1)
+        table.append(crc & 0xFFFF)
+    return table
+
+CRC_TABLE = _make_crc_table()
+
+# Signed little-endian register formats by data length
+REGISTER_FORMATS = {1: '<b', 2: '<h', 4: '<i'}
+
+# FF FF FD inside a packet body must be byte-stuffed; see Protocol 2.0 spec
+STUFFING_PATTERN = b'\xff\xff\xfd'
+
+
+def update_crc(crc: int, data) -> int:
+    '''
+    Continue a Protocol 2.0 CRC over data, starting from a previous CRC value.
+
+    Parameters:
+    - crc (int): CRC accumulated so far (0 for a fresh packet).
+    - data (bytes-like): Bytes to fold into the CRC.
+
+    Returns:
+    - int: The updated 16-bit CRC.
+    '''
+    table = CRC_TABLE
+    for byte in data:
+        crc = ((crc << 8) ^ table[((crc >> 8) ^ byte) & 0xFF]) & 0xFFFF
+    return crc
+
+
+class SyncWritePacket:
+    '''
+    Preallocated Protocol 2.0 sync write packet for a fixed register and motor set.
+
+    The header, instruction, address and motor IDs never change between commands, so
+    the packet is built once and the CRC of that fixed prefix is cached. Each command
+    packs the goal values in place with struct.pack_into, folds only the variable tail
+    into the cached CRC and writes the buffer straight to the port.
+
+    Parameters:
+    - start_address (int): Control table address to write.
+    - data_length (int): Register size in bytes (1, 2 or 4).
+    - motor_ids (List[int]): IDs of the motors in the order values are passed.
+    '''
+    def __init__(self, start_address: int, data_length: int, motor_ids: List[int]) -> None:
+        self.start_address = start_address
+        self.data_length = data_length
+        self.motor_ids = list(motor_ids)
+
+        # HEADER(4) ID LEN(2) INST ADDR(2) DATA_LEN(2) [ID DATA...]*N CRC(2)
+        param_length = len(self.motor_ids) * (1 + data_length)
+        packet_length = param_length + 7
+        self.size = packet_length + 7
+
+        self.buffer = bytearray(self.size)
+        struct.pack_into('<4BBHBHH', self.buffer, 0, 0xFF, 0xFF, 0xFD, 0x00, BROADCAST_ID,
+                         packet_length, INST_SYNC_WRITE, start_address, data_length)
+        for i, motor_id in enumerate(self.motor_ids):
+            self.buffer[12 + i * (1 + data_length)] = motor_id
+        self.view = memoryview(self.buffer)
+
+        # Values start right after the first motor ID; everything before is fixed
+        self._tail_start = 13
+        self._crc_offset = self.size - 2
+        self._prefix_crc = update_crc(0, self.view[:self._tail_start])
+
+        # One struct for the whole variable tail: value, (id, value)*
+        self._tail = struct.Struct('<' + ('B'.join([REGISTER_FORMATS[data_length][1]] * len(self.motor_ids))))
+        self._ids = self.motor_ids[1:]
+
+        self.pack(*([0] * len(self.motor_ids)))
+
+    def pack(self, *values: int) -> bool:
+        '''
+        Pack goal values into the packet in place and update its CRC.
+
+        Parameters:
+        - values (int): One raw register value per motor, in motor_ids order.
+
+        Returns:
+        - bool: False if the packed body needs byte stuffing and cannot be sent as is.
+        '''
+        # Interleave the fixed IDs between values so the tail is packed in one call
+        args = [values[0]]
+        for motor_id, value in zip(self._ids, values[1:]):
+            args.append(motor_id)
+            args.append(value)
+        self._tail.pack_into(self.buffer, self._tail_start, *args)
+
+        crc = update_crc(self._prefix_crc, self.view[self._tail_start:self._crc_offset])
+        self.buffer[self._crc_offset] = crc & 0xFF
+        self.buffer[self._crc_offset + 1] = crc >> 8
+
+        return self.buffer.find(STUFFING_PATTERN, 5, self._crc_offset) < 0
+
+    def write(self, port_handler) -> int:
+        '''
+        Write the packed packet to the port without building any intermediate lists.
+
+        Parameters:
+        - port_handler (PortHandler): Open Dynamixel SDK port handler.
+
+        Returns:
+        - int: Dynamixel SDK communication result code.
+        '''
+        if port_handler.is_using:
+            return COMM_PORT_BUSY
+
+        if port_handler.writePort(self.view) != self.size:
+            return COMM_TX_FAIL
+        return COMM_SUCCESS
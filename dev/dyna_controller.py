@@ -1,12 +1,21 @@
 from dynamixel_sdk import *  # Uses Dynamixel SDK library
 from mocap_stream import set_realtime_priority
-from typing import Dict, Tuple
+from dxl_packets import SyncWritePacket
+from collections import namedtuple
+from typing import Dict, Optional, Tuple
 import numpy as np
 import cProfile
 import logging
 import math
+import struct
 import time
 
+# Decoded present values of one motor, in raw signed register units
+Telemetry = namedtuple('Telemetry', ['pwm', 'current', 'velocity', 'position'])
+
+# Present PWM(2) Current(2) Velocity(4) Position(4) at contiguous addresses 124-135
+TELEMETRY_FORMAT = struct.Struct('<hhii')
+
 
 class DynaController:
     def __init__(self, com_port: str = 'COM5', baud_rate: int = 4000000) -> None:
@@ -21,6 +30,7 @@ class DynaController:
         self.X_SET_CURRENT = 102         # Set torque
         self.X_GET_CURRENT = 126         # Get torque
         self.X_SET_PWM = 100            # Set PWM
+        self.X_GET_PWM = 124            # Get PWM (start of present value block)
         self.X_P_GAIN = 84              # P gain
         self.X_D_GAIN = 80              # D gain
         self.X_FF_2_GAIN = 88           # Feedforward 2 gain
@@ -64,35 +74,52 @@ class DynaController:
         for motor_id in [self.pan_id, self.tilt_id]:
             self.pwm_sync_write.addParam(motor_id, empty_byte_array)
 
+        # Preallocated sync write packets for the per-tick command path
+        self.pos_packet = SyncWritePacket(self.X_SET_POS, 4, [self.pan_id, self.tilt_id])
+        self.pwm_packet = SyncWritePacket(self.X_SET_PWM, 2, [self.pan_id, self.tilt_id])
+
+        # Initialize GroupSyncRead instance for present PWM/current/velocity/position
+        self.telemetry_sync_read = GroupSyncRead(self.port_handler, self.packet_handler, self.X_GET_PWM, TELEMETRY_FORMAT.size)
+        for motor_id in [self.pan_id, self.tilt_id]:
+            self.telemetry_sync_read.addParam(motor_id)
+
         # Open port
         # self.open_port()
 
         # Init motor rotations to normal forward gaze
         # self.set_sync_pos(225, 315)
 
-    def open_port(self) -> bool:
+    def open_port(self, retries: int = 0, retry_delay: float = 0.02) -> bool:
         '''
         Open serial port for communication with servo.
-        
+
+        Parameters:
+        - retries (int): Extra attempts if the port cannot be opened, e.g. while another process releases it.
+        - retry_delay (float): Seconds before the first retry; doubled after each failed attempt.
+
         Returns:
         - bool: True if port opened successfully, False otherwise.'''
 
-        try:
-            if self.port_handler.openPort():
-                logging.info("Succeeded to open the port")
-            else:
-                logging.error("Failed to open the port")
-                return False
-
-            if self.port_handler.setBaudRate(self.baud):
-                logging.info("Succeeded to change the baudrate")
-            else:
-                logging.error("Failed to change the baudrate")
-                return False
-            return True
-        except Exception as e:
-            print(f"Error opening port: {e}")
-            return False
+        for attempt in range(retries + 1):
+            if attempt:
+                time.sleep(retry_delay * 2 ** (attempt - 1))
+
+            try:
+                if self.port_handler.openPort():
+                    logging.info("Succeeded to open the port")
+                else:
+                    logging.error("Failed to open the port")
+                    continue
+
+                if self.port_handler.setBaudRate(self.baud):
+                    logging.info("Succeeded to change the baudrate")
+                else:
+                    logging.error("Failed to change the baudrate")
+                    return False
+                return True
+            except Exception as e:
+                print(f"Error opening port: {e}")
+        return False
 
     def set_sync_current(self, pan_current: int, tilt_current: int) -> None:
         """
@@ -128,31 +155,32 @@ class DynaController:
         Returns:
         - Tuple[int, int]: The current values of the pan and tilt motors.
         """
-        # Initialize GroupSyncRead instance for current
-        current_sync_read = GroupSyncRead(self.port_handler, self.packet_handler, self.X_GET_CURRENT, 2)
-        
-        # Add motor IDs to sync read
-        current_sync_read.addParam(self.pan_id)
-        current_sync_read.addParam(self.tilt_id)
-        
-        # Execute sync read
-        dxl_comm_result = current_sync_read.txRxPacket()
-        if dxl_comm_result != COMM_SUCCESS:
-            logging.error(f"Failed to get sync current: {self.packet_handler.getTxRxResult(dxl_comm_result)}")
+        telemetry = self.get_sync_telemetry()
+        if telemetry is None:
             return (-1, -1)  # Indicate an error
 
-        # Retrieve the data
-        pan_current = current_sync_read.getData(self.pan_id, self.X_GET_CURRENT, 2)
-        tilt_current = current_sync_read.getData(self.tilt_id, self.X_GET_CURRENT, 2)
+        pan, tilt = telemetry
+        return (pan.current, tilt.current)
 
-        # Convert from 2 bytes to integers
-        pan_current_value = DXL_MAKEWORD(pan_current[0], pan_current[1]) if pan_current is not None else -1
-        tilt_current_value = DXL_MAKEWORD(tilt_current[0], tilt_current[1]) if tilt_current is not None else -1
+    def get_sync_telemetry(self) -> Optional[Tuple[Telemetry, Telemetry]]:
+        """
+        Read present PWM, current, velocity and position of both motors in one sync read.
 
-        # Clear sync read parameter storage
-        current_sync_read.clearParam()
-        
-        return (pan_current_value, tilt_current_value)
+        Returns:
+        - Optional[Tuple[Telemetry, Telemetry]]: Pan and tilt telemetry in raw signed units, None on failure.
+        """
+        dxl_comm_result = self.telemetry_sync_read.txRxPacket()
+        if dxl_comm_result != COMM_SUCCESS:
+            logging.error(f"Failed to get sync telemetry: {self.packet_handler.getTxRxResult(dxl_comm_result)}")
+            return None
+
+        return self._decode_telemetry()
+
+    def _decode_telemetry(self) -> Tuple[Telemetry, Telemetry]:
+        data = self.telemetry_sync_read.data_dict
+        pan = Telemetry._make(TELEMETRY_FORMAT.unpack(bytes(data[self.pan_id])))
+        tilt = Telemetry._make(TELEMETRY_FORMAT.unpack(bytes(data[self.tilt_id])))
+        return pan, tilt
     
     def set_pos(self, motor_id: int = 1, pos: float = 180) -> None:
         '''
@@ -177,10 +205,24 @@ class DynaController:
         - tilt_pos (float): Desired tilt position in degrees.
         '''
         # Convert from degrees to encoder position
-        pan_pos = int(pan_pos * 4095 / 360)
-        tilt_pos = int(tilt_pos * 4095 / 360)
+        self.set_sync_ticks(int(pan_pos * 4095 / 360), int(tilt_pos * 4095 / 360))
 
-        # Allocate goal positions value into byte array
+    def set_sync_ticks(self, pan_pos: int, tilt_pos: int) -> None:
+        '''
+        Set servo goal positions synchronously for both motors in encoder ticks.
+        
+        Parameters:
+        - pan_pos (int): Desired pan position in ticks.
+        - tilt_pos (int): Desired tilt position in ticks.
+        '''
+        # Pack goal positions in place and write the prebuilt packet
+        if self.pos_packet.pack(pan_pos, tilt_pos):
+            dxl_comm_result = self.pos_packet.write(self.port_handler)
+            if dxl_comm_result != COMM_SUCCESS:
+                logging.debug(self.packet_handler.getTxRxResult(dxl_comm_result))
+            return
+
+        # Rare values that need byte stuffing go through the SDK
         pan_byte_array = [DXL_LOBYTE(DXL_LOWORD(pan_pos)), DXL_HIBYTE(DXL_LOWORD(pan_pos)), DXL_LOBYTE(DXL_HIWORD(pan_pos)), DXL_HIBYTE(DXL_HIWORD(pan_pos))]
         tilt_byte_array = [DXL_LOBYTE(DXL_LOWORD(tilt_pos)), DXL_HIBYTE(DXL_LOWORD(tilt_pos)), DXL_LOBYTE(DXL_HIWORD(tilt_pos)), DXL_HIBYTE(DXL_HIWORD(tilt_pos))]
 
@@ -200,7 +242,17 @@ class DynaController:
         - tilt_pwm (float): Desired tilt pwm %.
         '''
 
-        # Allocate goal positions value into byte array
+        pan_pwm = int(pan_pwm)
+        tilt_pwm = int(tilt_pwm)
+
+        # Pack goal PWM in place and write the prebuilt packet
+        if self.pwm_packet.pack(pan_pwm, tilt_pwm):
+            dxl_comm_result = self.pwm_packet.write(self.port_handler)
+            if dxl_comm_result != COMM_SUCCESS:
+                logging.debug(self.packet_handler.getTxRxResult(dxl_comm_result))
+            return
+
+        # Rare values that need byte stuffing go through the SDK
         pan_byte_array = [DXL_LOBYTE(DXL_LOWORD(pan_pwm)), DXL_HIBYTE(DXL_LOWORD(pan_pwm))]
         tilt_byte_array = [DXL_LOBYTE(DXL_LOWORD(tilt_pwm)), DXL_HIBYTE(DXL_LOWORD(tilt_pwm))]
 
@@ -457,10 +509,10 @@ class DynaController:
     def close_port(self):
         self.port_handler.closePort()
 
-def get_curr_bode():
+def get_curr_bode(com_port: str = 'COM5'):
     set_realtime_priority()
 
-    dyna = DynaController()
+    dyna = DynaController(com_port)
     dyna.open_port()
 
     dyna.set_op_mode(dyna.pan_id, 0)
@@ -512,7 +564,11 @@ def get_curr_bode():
             while time.perf_counter() - start_time < duration:
                 curr_d = (math.sin(2 * math.pi * frequency * (time.perf_counter() - start_time))) * 400
                 dyna.set_sync_pwm(int(curr_d), int(curr_d))
-                pan_pos, tilt_pos = dyna.get_sync_pos()
+                telemetry = dyna.get_sync_telemetry()
+                if telemetry is None:
+                    continue
+                pan_pos = dyna.convert_ticks_to_degrees(telemetry[0].position)
+                tilt_pos = dyna.convert_ticks_to_degrees(telemetry[1].position)
 
                 time_list.append(time.perf_counter() - start_time)
                 curr_d_list.append(int(curr_d))
@@ -525,10 +581,10 @@ def get_curr_bode():
             time.sleep(1)
             dyna.set_sync_current(0, 0)
 
-def get_theta_bode():
+def get_theta_bode(com_port: str = 'COM5'):
     set_realtime_priority()
 
-    dyna = DynaController()
+    dyna = DynaController(com_port)
     dyna.open_port()
 
     dyna.set_op_mode(dyna.pan_id, 3)
@@ -573,15 +629,19 @@ def get_theta_bode():
             while time.perf_counter() - start_time < duration:
                 theta_d = (math.sin(2 * math.pi * frequency * (time.perf_counter() - start_time))) * 30
                 dyna.set_sync_pos(225 + theta_d, 315 + theta_d)
-                pan_pos, tilt_pos = dyna.get_sync_pos()
+                telemetry = dyna.get_sync_telemetry()
+                if telemetry is None:
+                    continue
+                pan_pos = dyna.convert_ticks_to_degrees(telemetry[0].position)
+                tilt_pos = dyna.convert_ticks_to_degrees(telemetry[1].position)
 
                 time_list.append(time.perf_counter() - start_time)
                 theta_d_list.append(int(theta_d))
                 pan_pos_list.append(pan_pos)
                 tilt_pos_list.append(tilt_pos)
 
-            # Save data for analysis
-            data_filename = f'data/data_{frequency}Hz'
+            # Save data for analysis; theta_ prefix keeps these apart from the current sweeps
+            data_filename = f'data/theta_{frequency}Hz'
             np.savez(data_filename, time_list, theta_d_list, pan_pos_list, tilt_pos_list)
             time.sleep(1)
 
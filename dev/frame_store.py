@@ -0,0 +1,194 @@
+from typing import Optional, Tuple
+import numpy as np
+import struct
+import time
+import sys
+import os
+
+# File header: magic, version, header size, frame stride, dtype string, ndim, shape (up to 3 dims)
+STORE_MAGIC = b'DFRM'
+STORE_VERSION = 1
+STORE_HEADER = struct.Struct('<4sIQQ8sI3Q')
+
+# Frames start on page boundaries so writes and maps line up with the OS page cache
+PAGE_SIZE = 4096
+
+# Sidecar index: one record per frame, appended after the frame data is written
+INDEX_DTYPE = np.dtype([('frame_number', '<i8'), ('timestamp', '<f8'), ('offset', '<i8')])
+
+
+def _aligned(size: int) -> int:
+    return (size + PAGE_SIZE - 1) // PAGE_SIZE * PAGE_SIZE
+
+
+class FrameStoreWriter:
+    """
+    Append raw frames to one preallocated file with a sidecar index.
+
+    The file starts with a page-sized header describing the frame shape and dtype,
+    followed by the frames, each padded to a whole number of pages. Space is reserved
+    in chunks of preallocate frames so the file system does not extend the file on
+    every write. Each frame goes to disk as a single unbuffered write straight from the
+    array's memory. Its (frame number, timestamp, offset) record is then appended to
+    <path>.idx, so after a crash the index only lists frames that were fully written.
+    :param path: Container file to create
+    :param shape: Frame shape, e.g. (720, 960) or (720, 960, 3)
+    :param dtype: Pixel dtype
+    :param preallocate: Frames of space reserved at a time
+    """
+    def __init__(self, path: str, shape: Tuple[int, ...], dtype=np.uint8, preallocate: int = 256):
+        if not 1 <= len(shape) <= 3:
+            raise ValueError(f"Unsupported frame shape {shape}")
+        self.path = path
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.frame_size = int(np.prod(shape)) * self.dtype.itemsize
+        self.frame_stride = _aligned(self.frame_size)
+        self.header_size = PAGE_SIZE
+        self.preallocate = preallocate
+
+        self._file = open(path, 'wb', buffering=0)
+        self._file.write(self._header().ljust(self.header_size, b'\0'))
+        self._index = open(f'{path}.idx', 'wb')
+
+        self.count = 0
+        self._reserved = 0
+        self._reserve()
+
+    def _header(self) -> bytes:
+        shape = self.shape + (0,) * (3 - len(self.shape))
+        return STORE_HEADER.pack(STORE_MAGIC, STORE_VERSION, self.header_size, self.frame_stride,
+                                 self.dtype.str.encode(), len(self.shape), *shape)
+
+    def _reserve(self) -> None:
+        self._reserved += self.preallocate
+        self._file.truncate(self.header_size + self._reserved * self.frame_stride)
+
+    def append(self, frame: np.ndarray, frame_number: Optional[int] = None, timestamp: Optional[float] = None) -> int:
+        """
+        Write one frame at the end of the container.
+        :param frame: Array of the container's shape and dtype
+        :param frame_number: Source frame number, defaults to the position in the file
+        :param timestamp: Capture time, defaults to now
+        :return: Position of the frame in the container
+        """
+        if frame.shape != self.shape or frame.dtype != self.dtype:
+            raise ValueError(f"Frame {frame.shape} {frame.dtype} does not match container {self.shape} {self.dtype}")
+        if self.count == self._reserved:
+            self._reserve()
+
+        offset = self.header_size + self.count * self.frame_stride
+        self._file.seek(offset)
+        self._write_all(memoryview(np.ascontiguousarray(frame)).cast('B'))
+
+        record = np.array((self.count if frame_number is None else frame_number,
+                           time.perf_counter() if timestamp is None else timestamp, offset), dtype=INDEX_DTYPE)
+        self._index.write(record.tobytes())
+        self.count += 1
+        return self.count - 1
+
+    def _write_all(self, data: memoryview) -> None:
+        # Unbuffered writes may be partial; the index entry must only follow a complete frame
+        while len(data):
+            written = self._file.write(data)
+            if not written:
+                raise IOError(f"Short write to {self.path}")
+            data = data[written:]
+
+    def flush(self) -> None:
+        self._index.flush()
+
+    def close(self) -> None:
+        # Give back the unused reservation
+        self._file.truncate(self.header_size + self.count * self.frame_stride)
+        self._file.close()
+        self._index.close()
+
+
+class FrameStoreReader:
+    """
+    Random access to a container written by FrameStoreWriter.
+
+    The frames are memory-mapped, so reader[i] is a view into the file and only the
+    pages that are touched are read from disk. The index is loaded in full; a
+    container still being written can be reopened to see newer frames.
+    :param path: Container file
+    """
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            header = f.read(STORE_HEADER.size)
+        if len(header) < STORE_HEADER.size:
+            raise ValueError(f"{path} is too short to be a frame store.")
+        magic, version, self.header_size, self.frame_stride, dtype, ndim, *shape = STORE_HEADER.unpack(header)
+        if magic != STORE_MAGIC:
+            raise ValueError(f"{path} is not a frame store.")
+        if version != STORE_VERSION:
+            raise ValueError(f"{path} has version {version}, expected {STORE_VERSION}.")
+        self.dtype = np.dtype(dtype.rstrip(b'\0').decode())
+        self.shape = tuple(shape[:ndim])
+        self.frame_size = int(np.prod(self.shape)) * self.dtype.itemsize
+
+        # Trust the index only as far as the data file reaches
+        index = np.fromfile(f'{path}.idx', dtype=INDEX_DTYPE)
+        file_size = os.path.getsize(path)
+        self.index = index[index['offset'] + self.frame_size <= file_size]
+
+        self._map = None
+        if len(self.index):
+            self._map = np.memmap(path, dtype=np.uint8, mode='r', offset=self.header_size,
+                                  shape=(file_size - self.header_size,))
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    @property
+    def frame_numbers(self) -> np.ndarray:
+        return self.index['frame_number']
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self.index['timestamp']
+
+    def __getitem__(self, i: int) -> np.ndarray:
+        start = int(self.index['offset'][i]) - self.header_size
+        return self._map[start:start + self.frame_size].view(self.dtype).reshape(self.shape)
+
+    def find(self, frame_number: int) -> Optional[int]:
+        """
+        Position of a source frame number in the container, or None if it was not recorded.
+        """
+        i = int(np.searchsorted(self.frame_numbers, frame_number))
+        if i < len(self) and self.frame_numbers[i] == frame_number:
+            return i
+        return None
+
+    def close(self) -> None:
+        self._map = None
+
+
+def benchmark(path: str = 'frame_store_bench.frames', frames: int = 500, shape: Tuple[int, ...] = (720, 960)) -> None:
+    """
+    Sustained append rate and random read check for 960x720 frames.
+    """
+    frame = np.random.default_rng(0).integers(0, 255, shape, dtype=np.uint8)
+    writer = FrameStoreWriter(path, shape)
+    start = time.perf_counter()
+    for i in range(frames):
+        frame[0, 0] = i % 256
+        writer.append(frame, i)
+    os.fsync(writer._file.fileno())
+    elapsed = time.perf_counter() - start
+    writer.close()
+    print(f"{frames / elapsed:.0f} frames/s, {frames * frame.nbytes / elapsed / 1e6:.0f} MB/s")
+
+    reader = FrameStoreReader(path)
+    i = frames // 2
+    print(f"{len(reader)} frames, frame {i} {'ok' if reader[i][0, 0] == i % 256 else 'CORRUPT'}")
+    reader.close()
+    os.remove(path)
+    os.remove(f'{path}.idx')
+
+
+if __name__ == '__main__':
+    benchmark(*sys.argv[1:2])
@@ -10,6 +10,15 @@ class ImageProcessor:
         self.show_crosshair = False
         self.detect_circle_flag = False
 
+        # Circle tracking: search only around the last detection while it keeps being found
+        self.track_circle = True
+        self.last_circle = None       # (x, y, radius) of the last detection in frame pixels
+        self.misses = 0               # Consecutive tracked frames without a detection
+        self.max_misses = 5           # Misses before falling back to a full-frame search
+        self.roi_scale = 3.0          # ROI half-size in radii; grows by one radius per miss
+        self.min_roi = 40             # Smallest ROI half-size (px)
+        self.radius_tolerance = 0.3   # Accepted radius change between detections (fraction)
+
     def process_frame(self, frame):
         """
         Process the given frame based on the specified flags.
@@ -46,18 +55,31 @@ class ImageProcessor:
         """
         Detect and draw circles in the given frame.
 
+        With track_circle set and a previous detection, only a region around it is
+        searched, for radii close to the previous one. The region grows with each
+        missed frame, and after max_misses misses the whole frame is searched again.
+
         :param frame: The frame in which circles will be detected.
         :return: The frame with detected circles drawn.
         """
         try:
-            blurred_frame = cv2.medianBlur(frame, 5)
-            circles = cv2.HoughCircles(blurred_frame, cv2.HOUGH_GRADIENT, dp=1.2, minDist=100,
-                                       param1=self.threshold_value, param2=self.strength_value,
-                                       minRadius=0, maxRadius=0)
+            circles = None
+            if self.track_circle and self.last_circle is not None:
+                circles = self.search_roi(frame)
+
+            if circles is None and (self.last_circle is None or not self.track_circle):
+                blurred_frame = cv2.medianBlur(frame, 5)
+                circles = cv2.HoughCircles(blurred_frame, cv2.HOUGH_GRADIENT, dp=1.2, minDist=100,
+                                           param1=self.threshold_value, param2=self.strength_value,
+                                           minRadius=0, maxRadius=0)
+                if circles is not None:
+                    circles = circles[0]
 
             if circles is not None:
+                self.last_circle = tuple(float(v) for v in circles[0])
+                self.misses = 0
                 circles = np.uint16(np.around(circles))
-                for i in circles[0, :]:
+                for i in circles:
                     cv2.circle(frame, (i[0], i[1]), i[2], (255, 0, 255), 2)  # Draw the circle outline
                     cv2.circle(frame, (i[0], i[1]), 1, (255, 0, 255), 3)  # Draw the circle center
         except Exception as e:
@@ -65,6 +87,55 @@ class ImageProcessor:
 
         return frame
 
+    def search_roi(self, frame):
+        """
+        Search for the tracked circle in a window around its last position.
+
+        :param frame: The grayscale frame to search.
+        :return: (N, 3) array of circles in frame coordinates, or None if the circle was not found.
+        """
+        x, y, radius = self.last_circle
+        height, width = frame.shape[:2]
+        half = int(max((self.roi_scale + self.misses) * radius, self.min_roi))
+        x0, y0 = max(int(x) - half, 0), max(int(y) - half, 0)
+        x1, y1 = min(int(x) + half, width), min(int(y) + half, height)
+
+        circles = None
+        if x1 - x0 > 5 and y1 - y0 > 5:
+            blurred_roi = cv2.medianBlur(frame[y0:y1, x0:x1], 5)
+            circles = cv2.HoughCircles(blurred_roi, cv2.HOUGH_GRADIENT, dp=1.2, minDist=100,
+                                       param1=self.threshold_value, param2=self.strength_value,
+                                       minRadius=max(int(radius * (1 - self.radius_tolerance)), 1),
+                                       maxRadius=int(radius * (1 + self.radius_tolerance)) + 1)
+
+        if circles is None:
+            self.misses += 1
+            if self.misses > self.max_misses:
+                self.reset_tracking()
+            return None
+
+        circles = circles[0]
+        circles[:, 0] += x0
+        circles[:, 1] += y0
+        return circles
+
+    def set_detect_circle(self, enabled):
+        """
+        Turn circle detection on or off, starting from a full-frame search either way.
+
+        :param enabled: Boolean flag to determine if circles should be detected.
+        """
+        # Reset before enabling so the first frame never searches an ROI from an earlier session
+        self.reset_tracking()
+        self.detect_circle_flag = bool(enabled)
+
+    def reset_tracking(self):
+        """
+        Forget the tracked circle so the next frame is searched in full.
+        """
+        self.last_circle = None
+        self.misses = 0
+
     def draw_crosshair(self, frame):
         """
         Draw a crosshair on the given frame.
@@ -0,0 +1,152 @@
+from dynamixel_sdk import GroupSyncRead, COMM_SUCCESS
+from dyna_controller import DynaController
+from typing import List, Optional, Tuple
+import numpy as np
+import logging
+import struct
+
+# X-series indirect address table: 20 two-byte address slots and their data window
+X_INDIRECT_ADDR = 168
+X_INDIRECT_DATA = 224
+X_INDIRECT_SLOTS = 20
+
+# Registers the tracker cares about, as (name, address, size in bytes)
+DEFAULT_FIELDS = [
+    ('position', 132, 4),
+    ('velocity', 128, 4),
+    ('current', 126, 2),
+    ('torque_enable', 64, 1),
+    ('hardware_error', 70, 1),
+]
+
+# Little-endian record types by register size; multi-byte present values are signed
+FIELD_TYPES = {1: 'u1', 2: '<i2', 4: '<i4'}
+
+
+class IndirectTelemetry:
+    '''
+    Serve an arbitrary set of scattered registers through one sync read.
+
+    The X-series indirect address table is programmed from a declarative field list so
+    that the requested registers appear back to back in the indirect data window. A single
+    preconfigured GroupSyncRead then fetches them for both motors, and the reply bytes
+    are copied into a preallocated buffer viewed as a NumPy structured array, so decoding
+    allocates nothing.
+
+    Indirect addresses keep their values while the motors are powered, so configure()
+    reads the table back first and only reprograms it when it differs.
+
+    Parameters:
+    - dyna (DynaController): Controller with an open port.
+    - fields (List[Tuple[str, int, int]]): (name, address, size) of each register to map.
+    '''
+    def __init__(self, dyna: DynaController, fields: List[Tuple[str, int, int]] = DEFAULT_FIELDS) -> None:
+        self.dyna = dyna
+        self.fields = list(fields)
+        self.motor_ids = [dyna.pan_id, dyna.tilt_id]
+
+        # One indirect slot per mapped byte
+        self.addresses = [address + i for _, address, size in self.fields for i in range(size)]
+        if len(self.addresses) > X_INDIRECT_SLOTS:
+            raise ValueError(f"{len(self.addresses)} bytes requested but only {X_INDIRECT_SLOTS} indirect slots available.")
+        self.length = len(self.addresses)
+        self._table = struct.pack(f'<{self.length}H', *self.addresses)
+
+        # Structured record view over one preallocated buffer holding every motor's data
+        self.dtype = np.dtype([(name, FIELD_TYPES[size]) for name, _, size in self.fields])
+        self._buffer = bytearray(self.length * len(self.motor_ids))
+        self.records = np.frombuffer(self._buffer, dtype=self.dtype)
+
+        # Initialize GroupSyncRead instance over the indirect data window
+        self.sync_read = GroupSyncRead(dyna.port_handler, dyna.packet_handler, X_INDIRECT_DATA, self.length)
+        for motor_id in self.motor_ids:
+            self.sync_read.addParam(motor_id)
+
+        self.configured = False
+
+    def is_programmed(self, motor_id: int) -> bool:
+        '''
+        Check whether a motor's indirect address table already holds this mapping.
+        '''
+        data, dxl_comm_result, dxl_error = self.dyna.packet_handler.readTxRx(
+            self.dyna.port_handler, motor_id, X_INDIRECT_ADDR, 2 * self.length)
+        if dxl_comm_result != COMM_SUCCESS or dxl_error != 0:
+            return False
+        return bytes(data) == self._table
+
+    def configure(self, force: bool = False) -> bool:
+        '''
+        Program the indirect address table on each motor where it does not match.
+
+        Parameters:
+        - force (bool): Reprogram even if the table already matches.
+
+        Returns:
+        - bool: True if every motor holds the mapping.
+        '''
+        for motor_id in self.motor_ids:
+            if not force and self.is_programmed(motor_id):
+                logging.debug(f"[ID:{motor_id:03d}] Indirect mapping already programmed")
+                continue
+
+            # Indirect addresses can only be changed with torque disabled
+            torque = self.dyna.get_torque(motor_id)
+            if torque:
+                self.dyna.set_torque(motor_id, False)
+
+            dxl_comm_result, dxl_error = self.dyna.packet_handler.writeTxRx(
+                self.dyna.port_handler, motor_id, X_INDIRECT_ADDR, 2 * self.length, list(self._table))
+
+            if torque:
+                self.dyna.set_torque(motor_id, True)
+
+            if dxl_comm_result != COMM_SUCCESS:
+                logging.error(self.dyna.packet_handler.getTxRxResult(dxl_comm_result))
+                return False
+            elif dxl_error != 0:
+                logging.error(self.dyna.packet_handler.getRxPacketError(dxl_error))
+                return False
+
+            logging.info(f"[ID:{motor_id:03d}] Indirect mapping programmed")
+
+        self.configured = True
+        return True
+
+    def read(self) -> Optional[np.ndarray]:
+        '''
+        Read every mapped field of both motors with one sync read.
+
+        Returns:
+        - Optional[np.ndarray]: Structured array with one record per motor (pan, tilt), or None on
+          failure. The array is a view that is overwritten by the next read; copy it to keep it.
+        '''
+        if not self.configured and not self.configure():
+            return None
+
+        dxl_comm_result = self.sync_read.txRxPacket()
+        if dxl_comm_result != COMM_SUCCESS:
+            logging.error(f"Failed to read indirect telemetry: {self.dyna.packet_handler.getTxRxResult(dxl_comm_result)}")
+            return None
+
+        data = self.sync_read.data_dict
+        for i, motor_id in enumerate(self.motor_ids):
+            self._buffer[i * self.length:(i + 1) * self.length] = data[motor_id]
+
+        return self.records
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    dyna = DynaController()
+    dyna.open_port()
+
+    telemetry = IndirectTelemetry(dyna)
+    telemetry.configure()
+
+    records = telemetry.read()
+    if records is not None:
+        for name in records.dtype.names:
+            print(f"{name}: pan={records[name][0]} tilt={records[name][1]}")
+
+    dyna.close_port()
@@ -0,0 +1,132 @@
+from typing import Dict
+import math
+import time
+
+
+class LoopScheduler:
+    '''
+    Fixed-rate scheduler for real-time control loops.
+
+    Deadlines are absolute on time.perf_counter so timing errors do not accumulate.
+    Each wait sleeps for the bulk of the remaining period and busy-spins only the
+    last `spin_threshold` seconds, which keeps the wake-up accurate without
+    pinning a core for the whole cycle.
+
+    Usage:
+        scheduler = LoopScheduler(500)
+        while True:
+            do_work()
+            scheduler.wait()
+    '''
+    def __init__(self, rate_hz: float = 500, spin_threshold: float = 0.002) -> None:
+        if rate_hz <= 0:
+            raise ValueError("Loop rate must be positive.")
+
+        self.rate_hz = rate_hz
+        self.period = 1.0 / rate_hz
+        self.spin_threshold = spin_threshold
+
+        self.reset()
+
+    def reset(self) -> None:
+        '''
+        Re-anchor the schedule to now and clear all statistics.
+        '''
+        self._next_deadline = time.perf_counter() + self.period
+        self._last_wake = None
+
+        # Cycle statistics
+        self.cycles = 0
+        self.overruns = 0
+        self.skipped_cycles = 0
+        self._jitter_mean = 0.0
+        self._jitter_m2 = 0.0
+        self._jitter_max = 0.0
+        self._busy_total = 0.0
+
+    def wait(self) -> bool:
+        '''
+        Block until the next cycle deadline.
+
+        If the work for this cycle ran past the deadline the call returns
+        immediately and the overrun is recorded. When one or more whole periods
+        were missed the schedule is re-anchored rather than bursting to catch up.
+
+        Returns:
+        - bool: True if the deadline was met, False on overrun.
+        '''
+        now = time.perf_counter()
+        deadline = self._next_deadline
+
+        # Time spent doing work since the previous wake-up
+        if self._last_wake is not None:
+            self._busy_total += now - self._last_wake
+
+        if now > deadline:
+            self.overruns += 1
+            missed = int((now - deadline) / self.period)
+            if missed:
+                # Drop the missed cycles instead of running them back to back
+                self.skipped_cycles += missed
+                deadline += missed * self.period
+            self._next_deadline = deadline + self.period
+            self._record(now, now - deadline)
+            return False
+
+        # Coarse sleep for all but the final spin window
+        remaining = deadline - now
+        if remaining > self.spin_threshold:
+            time.sleep(remaining - self.spin_threshold)
+
+        # Fine spin up to the deadline
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+
+        self._next_deadline = deadline + self.period
+        self._record(now, now - deadline)
+        return True
+
+    def _record(self, now: float, jitter: float) -> None:
+        # Welford running mean/variance of wake-up error
+        self.cycles += 1
+        delta = jitter - self._jitter_mean
+        self._jitter_mean += delta / self.cycles
+        self._jitter_m2 += delta * (jitter - self._jitter_mean)
+        self._jitter_max = max(self._jitter_max, jitter)
+        self._last_wake = now
+
+    def stats(self) -> Dict[str, float]:
+        '''
+        Get loop timing statistics since the last reset.
+
+        Returns:
+        - Dict[str, float]: Cycle count, overruns, skipped cycles, jitter mean/std/max in
+          microseconds and the fraction of each period spent doing work.
+        '''
+        std = math.sqrt(self._jitter_m2 / self.cycles) if self.cycles else 0.0
+        elapsed = self.cycles * self.period
+        return {
+            "rate_hz": self.rate_hz,
+            "cycles": self.cycles,
+            "overruns": self.overruns,
+            "skipped_cycles": self.skipped_cycles,
+            "jitter_mean_us": self._jitter_mean * 1e6,
+            "jitter_std_us": std * 1e6,
+            "jitter_max_us": self._jitter_max * 1e6,
+            "load": self._busy_total / elapsed if elapsed else 0.0,
+        }
+
+    def format_stats(self) -> str:
+        s = self.stats()
+        return (f"Loop {s['rate_hz']:.0f} Hz: {s['cycles']} cycles, {s['overruns']} overruns "
+                f"({s['skipped_cycles']} skipped), jitter {s['jitter_mean_us']:.1f} +/- "
+                f"{s['jitter_std_us']:.1f} us (max {s['jitter_max_us']:.1f} us), load {s['load']:.0%}")
+
+
+if __name__ == '__main__':
+    scheduler = LoopScheduler(500)
+    for _ in range(2500):
+        scheduler.wait()
+    print(scheduler.format_stats())
@@ -0,0 +1,117 @@
+from typing import Optional
+import numpy as np
+import timeit
+
+
+class MarkerFusion:
+    """
+    Fuse all unlabelled markers of a frame into one target position.
+
+    Each frame's markers arrive as one (N, 3) array and are processed without Python
+    loops over markers:
+    1. Gate: drop markers further than gate_radius from the previous estimate.
+    2. Cluster: pick the marker with the most neighbours within cluster_radius as the
+       seed (ties broken by distance to the previous estimate) and keep its neighbours.
+    3. Estimate: Gaussian-weighted centroid of the cluster around the seed.
+
+    After max_misses frames without an accepted marker the gate is dropped and the
+    target is reacquired from the densest cluster in the whole frame.
+    :param gate_radius: Max distance (mm) a marker may move from the previous estimate per frame
+    :param cluster_radius: Markers within this distance (mm) of the seed belong to the target
+    :param max_misses: Consecutive rejected frames before the gate is reset
+    """
+    def __init__(self, gate_radius: float = 150.0, cluster_radius: float = 40.0, max_misses: int = 50):
+        self.gate_radius = gate_radius
+        self.cluster_radius = cluster_radius
+        self.max_misses = max_misses
+
+        self.estimate = None
+        self.misses = 0
+        self.cluster_size = 0
+
+        self._gate_sq = gate_radius ** 2
+        self._cluster_sq = cluster_radius ** 2
+        self._inv_two_sigma_sq = 1.0 / (2 * (cluster_radius / 2) ** 2)
+
+    def reset(self) -> None:
+        self.estimate = None
+        self.misses = 0
+        self.cluster_size = 0
+
+    def update(self, markers: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Fuse one frame of markers.
+        :param markers: (N, 3) or (N, 4) marker array from get_3d_markers_no_label; extra columns are ignored
+        :return: Fused (3,) position, or None if no marker was accepted this frame
+        """
+        markers = np.asarray(markers, dtype=float)
+        if markers.ndim != 2 or markers.shape[0] == 0:
+            return self._miss()
+        markers = markers[:, :3]
+
+        # QTM reports occluded markers as NaN
+        valid = ~np.isnan(markers).any(axis=1)
+        if not valid.all():
+            markers = markers[valid]
+
+        # Gate against the previous estimate
+        if self.estimate is not None:
+            prev_sq = ((markers - self.estimate) ** 2).sum(axis=1)
+            gated = prev_sq < self._gate_sq
+            markers = markers[gated]
+            prev_sq = prev_sq[gated]
+        if markers.shape[0] == 0:
+            return self._miss()
+
+        # Pairwise squared distances; N is at most a few dozen so the (N, N) block is cheap
+        diff = markers[:, None, :] - markers[None, :, :]
+        pair_sq = np.einsum('ijk,ijk->ij', diff, diff)
+        neighbours = pair_sq < self._cluster_sq
+        counts = neighbours.sum(axis=1)
+
+        # Densest marker seeds the cluster; prefer the one closest to the previous estimate
+        # (gated distances are below the gate, so the tie-break term stays under one neighbour)
+        if self.estimate is not None:
+            seed = np.argmax(counts - prev_sq / self._gate_sq)
+        else:
+            seed = np.argmax(counts)
+
+        members = neighbours[seed]
+        weights = np.exp(-pair_sq[seed, members] * self._inv_two_sigma_sq)
+        estimate = weights @ markers[members] / weights.sum()
+
+        self.estimate = estimate
+        self.misses = 0
+        self.cluster_size = int(members.sum())
+        return estimate
+
+    def _miss(self) -> None:
+        self.misses += 1
+        self.cluster_size = 0
+        if self.misses >= self.max_misses:
+            self.estimate = None
+        return None
+
+
+def benchmark(repeats: int = 2000) -> None:
+    """
+    Time the fusion step for growing marker counts: a target cluster plus clutter.
+    """
+    rng = np.random.default_rng(0)
+    target = np.array([500.0, 1200.0, 800.0])
+
+    for num_markers in (1, 4, 16, 32, 64):
+        cluster = target + rng.normal(0, 3, (min(num_markers, 4), 3))
+        clutter = rng.uniform(-3000, 3000, (num_markers - cluster.shape[0], 3))
+        markers = np.vstack((cluster, clutter))
+        rng.shuffle(markers)
+
+        fusion = MarkerFusion()
+        fusion.update(markers)
+        elapsed = timeit.timeit(lambda: fusion.update(markers), number=repeats) / repeats
+        error = np.linalg.norm(fusion.estimate - target)
+        print(f"{num_markers:3d} markers: {elapsed * 1e6:6.1f} us/frame, cluster of {fusion.cluster_size}, error {error:.2f} mm")
+
+
+if __name__ == '__main__':
+    benchmark()
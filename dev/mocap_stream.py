@@ -1,8 +1,14 @@
-from threading import Thread
+from threading import Thread, Condition
+from collections import namedtuple
 from scipy.io import savemat
+from typing import Optional, Tuple
 import logging
+import numpy as np
 import asyncio
+import ctypes
+import struct
 import math
+import time
 import qtm
 
 # System imports
@@ -10,9 +16,119 @@ import os
 import psutil
 
 
+# Snapshot of one QTM frame: frame_number and timestamp (us) come from the QTM packet header
+MocapFrame = namedtuple('MocapFrame', ['frame_number', 'timestamp', 'lost', 'position', 'position2'])
+
+# Fixed-layout record of everything MoCap publishes for one frame
+FRAME_DTYPE = np.dtype([
+    ('frame_number', '<i8'),
+    ('timestamp', '<i8'),
+    ('lost', '?'),
+    ('position', '<f8', 3),
+    ('position2', '<f8', 3),
+    ('matrix', '<f8', (3, 3)),
+])
+
+# Sequence counter preceding the record in a FrameSnapshot buffer
+SEQUENCE = struct.Struct('<Q')
+
+
+class FrameSnapshot:
+    """
+    Seqlock over one preallocated FRAME_DTYPE record, for a single writer and any number of readers.
+
+    The writer makes the sequence counter odd, overwrites the record and makes it even
+    again. Readers copy the record bytes and retry if the counter was odd or changed
+    meanwhile, so they always get all fields from the same frame without taking a lock
+    and without ever blocking the writer.
+
+    The counter and record live in one buffer, so the same layout can be placed in
+    shared memory and read from another process.
+    :param buffer: Writable buffer of at least FrameSnapshot.size bytes, None to allocate one
+    """
+    size = SEQUENCE.size + FRAME_DTYPE.itemsize
+
+    def __init__(self, buffer=None):
+        self.buffer = bytearray(self.size) if buffer is None else buffer
+        self._view = memoryview(self.buffer)[:self.size]
+        self._record = np.ndarray((1,), dtype=FRAME_DTYPE, buffer=self.buffer, offset=SEQUENCE.size)
+
+    @property
+    def sequence(self) -> int:
+        return SEQUENCE.unpack_from(self.buffer)[0]
+
+    def publish(self, frame_number: int, timestamp: int, lost: bool, position, position2, matrix) -> None:
+        """
+        Overwrite the record with a new frame. Must only be called from one thread.
+        """
+        sequence = SEQUENCE.unpack_from(self.buffer)[0]
+        SEQUENCE.pack_into(self.buffer, 0, sequence + 1)
+        self._record[0] = (frame_number, timestamp, lost, position, position2, matrix)
+        SEQUENCE.pack_into(self.buffer, 0, sequence + 2)
+
+    def read(self) -> np.void:
+        """
+        Take a consistent copy of the latest record.
+        :return: Read-only FRAME_DTYPE record
+        """
+        return self.read_sequenced()[1]
+
+    def read_sequenced(self) -> Tuple[int, np.void]:
+        """
+        Take a consistent copy of the latest record along with the sequence it was written at.
+        :return: Even sequence number (twice the number of completed writes) and the record
+        """
+        view = self._view
+        while True:
+            before = SEQUENCE.unpack_from(view)[0]
+            if before & 1:
+                # Writer is mid-publish; let it run instead of spinning through the GIL switch interval
+                time.sleep(0)
+                continue
+            data = bytes(view[SEQUENCE.size:])
+            if SEQUENCE.unpack_from(view)[0] == before:
+                return before, np.frombuffer(data, dtype=FRAME_DTYPE)[0]
+
+
+class FrameSlot:
+    """
+    Single-slot handoff of the newest mocap frame from the QTM thread to a consumer.
+
+    The producer overwrites the slot and notifies; consumers block until a frame
+    newer than the last one they handled arrives. Older unread frames are dropped,
+    so a slow consumer always works on the latest data and never sees a duplicate.
+    """
+    def __init__(self):
+        self._cond = Condition()
+        self._frame = None
+
+    def publish(self, frame: MocapFrame) -> None:
+        with self._cond:
+            self._frame = frame
+            self._cond.notify_all()
+
+    def latest(self) -> Optional[MocapFrame]:
+        return self._frame
+
+    def wait_next(self, last_frame_number: Optional[int] = None, timeout: Optional[float] = None) -> Optional[MocapFrame]:
+        """
+        Wait for a frame newer than last_frame_number.
+        :param last_frame_number: Frame number last handled by the caller, None for any frame
+        :param timeout: Seconds to wait, 0 to poll, None to wait forever
+        :return: The newest frame, or None if no new frame arrived within the timeout
+        """
+        def is_new():
+            return self._frame is not None and self._frame.frame_number != last_frame_number
+
+        with self._cond:
+            if not self._cond.wait_for(is_new, timeout):
+                return None
+            return self._frame
+
+
 class MoCap(Thread):
 
-    def __init__(self, qtm_ip="192.168.100.1", stream_type='6d'):
+    def __init__(self, qtm_ip="192.168.100.1", stream_type='6d', ring=None, fusion=None, marker_tracker=None, start=True):
         """
         Constructs QtmWrapper object
         :param position: 6D body position
@@ -21,6 +137,13 @@ class MoCap(Thread):
         :param qtm_ip: IP of QTM instance, but doesn't seem to matter
         :param stream_type: Specify components to receive,
                             see: https://github.com/qualisys/qualisys_python_sdk/blob/master/qtm/qrt.py
+        :param ring: Optional shm_ring.FrameRing that every frame is also published into for other processes
+        :param fusion: Optional marker_fusion.MarkerFusion; in '3d' mode the target position is fused from all markers
+                       except the calibration marker, after marker_tracker has identified it
+        :param marker_tracker: Optional marker_tracker.MarkerTracker; in '3d' mode the target and calibration
+                               markers are followed by persistent ID instead of by QTM's marker order
+        :param start: Connect to QTM and start streaming; False leaves the thread unstarted so packets
+                      can be fed to _on_packet directly, e.g. from recorded data or benchmarks
         """
 
         Thread.__init__(self)
@@ -33,15 +156,22 @@ class MoCap(Thread):
 
         # Kinematic data vars
         self.state = [0, 0, 0, 0, 0, 0]
-        self.position = [0,0,0]
-        self.position2 = [0,0,0]
-        self.matrix = None
         self.yaw = 0
         self.pitch = 0
-        self.lost = False
         self.calibration_target = False
 
-        self.start()
+        # Latest consistent frame record, plus new frame notification for consumers
+        self.snapshot = FrameSnapshot()
+        self._position = [0, 0, 0]
+        self._position2 = [0, 0, 0]
+        self._matrix = np.zeros((3, 3))
+        self.frames = FrameSlot()
+        self.ring = ring
+        self.fusion = fusion
+        self.marker_tracker = marker_tracker
+
+        if start:
+            self.start()
 
     def run(self) -> None:
         """
@@ -80,6 +210,22 @@ class MoCap(Thread):
             # Assign 6D streaming callback
             await self._connection.stream_frames(components=["3dnolabels"], on_packet=self._on_packet)
 
+    @property
+    def position(self) -> np.ndarray:
+        return self.snapshot.read()['position']
+
+    @property
+    def position2(self) -> np.ndarray:
+        return self.snapshot.read()['position2']
+
+    @property
+    def matrix(self) -> np.ndarray:
+        return self.snapshot.read()['matrix']
+
+    @property
+    def lost(self) -> bool:
+        return bool(self.snapshot.read()['lost'])
+
     def _on_packet(self, packet) -> None:
         """
         Process 6D packet stream into Pose object and pass on.
@@ -88,43 +234,91 @@ class MoCap(Thread):
         packet : QRTPacket
             Incoming packet from QTM
         """
+        position = self._position
+        position2 = self._position2
+        matrix = self._matrix
+        lost = False
+
         if self.stream_type == '6d':
             # Extract new 6D component from packet
             header, new_component = packet.get_6d()
 
-            # If no new component: mark as lost and return from function
+            # If no new component: mark as lost and keep the last pose
             if not new_component:
                 logging.warning('[QTM] 6DoF rigid body not found.')
-                self.lost = True
-                return
-
-            pos, mat = new_component[0]
-            self.position = [pos.x, pos.y, pos.z]
-            self.matrix = [mat.matrix[0:3], mat.matrix[3:6], mat.matrix[6:9]]
-
-            self.lost = False
+                lost = True
+            else:
+                pos, mat = new_component[0]
+                position = [pos.x, pos.y, pos.z]
+                matrix = [mat.matrix[0:3], mat.matrix[3:6], mat.matrix[6:9]]
 
         elif self.stream_type == '3d': 
             # Extract new unlabelled 3d component from packet
             header, new_component = packet.get_3d_markers_no_label()
 
-            # If no new component: mark as lost and return from function
+            # If no new component: mark as lost and keep the last position
             if not new_component:
                 logging.warning('[QTM] 3D Unlabelled marker not found.')
-                self.lost = True
-                return
-
-            pos = new_component[0]
-            self.position = [pos.x, pos.y, pos.z]
-
-            # Ensure there is more than one component before accessing it
-            if self.calibration_target and len(new_component) > 1:
-                pos = new_component[1]
-                self.position2 = [pos.x, pos.y, pos.z]
+                lost = True
             else:
-                logging.info('Calibration target is set but only one marker detected.')
-
-        self.lost = False
+                markers = np.array(new_component)
+                target = None
+                calibration_row = None
+
+                if self.marker_tracker is not None:
+                    # Follow the target and calibration markers by track ID
+                    ids = self.marker_tracker.update(markers, packet.timestamp)
+                    target = self.marker_tracker.follow('target', ids, markers)
+
+                    if self.calibration_target:
+                        # Unseen calibration marker is reported as NaN rather than its last position
+                        position2 = [np.nan] * 3
+                        target_id = self.marker_tracker.role_id('target')
+                        exclude = () if target_id is None else (target_id,)
+                        second = self.marker_tracker.follow('calibration', ids, markers, exclude)
+                        if second is not None:
+                            position2 = second.tolist()
+                            calibration_row = int(np.flatnonzero(ids == self.marker_tracker.role_id('calibration'))[0])
+                else:
+                    target = markers[0, :3]
+
+                    # Ensure there is more than one component before accessing it
+                    if self.calibration_target and len(markers) > 1:
+                        position2 = markers[1, :3].tolist()
+                        calibration_row = 1
+                    elif self.calibration_target:
+                        logging.info('Calibration target is set but only one marker detected.')
+                        position2 = [np.nan] * 3
+
+                if self.fusion is not None:
+                    # Fuse every marker of the frame except the calibration marker into one estimate
+                    if calibration_row is not None:
+                        markers = np.delete(markers, calibration_row, axis=0)
+                    target = self.fusion.update(markers)
+
+                if target is None:
+                    logging.warning('[QTM] Target marker not visible.')
+                    lost = True
+                else:
+                    position = target.tolist()
+
+        # Publish all fields of this frame in one step so readers never see a mix of two frames
+        self._position = position
+        self._position2 = position2
+        self._matrix = matrix
+        self.snapshot.publish(packet.framenumber, packet.timestamp, lost, position, position2, matrix)
+        self.frames.publish(MocapFrame(packet.framenumber, packet.timestamp, lost, position, position2))
+        if self.ring is not None:
+            self.ring.publish(packet.framenumber, packet.timestamp, lost, position, position2, matrix)
+
+    def wait_for_frame(self, last_frame_number: Optional[int] = None, timeout: Optional[float] = None) -> Optional[MocapFrame]:
+        """
+        Block until a frame newer than last_frame_number has been received.
+        :param last_frame_number: Frame number last handled by the caller
+        :param timeout: Seconds to wait, 0 to poll, None to wait forever
+        :return: Newest MocapFrame, or None on timeout
+        """
+        return self.frames.wait_next(last_frame_number, timeout)
 
     async def _close(self) -> None:
         """
@@ -138,7 +332,8 @@ class MoCap(Thread):
         Stop QTM wrapper thread.
         """
         self._stay_open = False
-        self.join()
+        if self.ident is not None:
+            self.join()
 
 
 def set_realtime_priority():
@@ -146,6 +341,8 @@ def set_realtime_priority():
         p = psutil.Process(os.getpid())
         if psutil.WINDOWS:
             p.nice(psutil.REALTIME_PRIORITY_CLASS)
+            # 1 ms timer resolution so short sleeps are not rounded up to 15.6 ms
+            ctypes.windll.winmm.timeBeginPeriod(1)
         elif psutil.LINUX or psutil.MACOS:
             # Set a high priority; be cautious with setting it to -20 (maximum priority)
             p.nice(-10)  # Modify this value as needed
@@ -0,0 +1,183 @@
+from vec_math2 import LocalTransform, beam_directions
+from threading import Thread, Event
+from typing import Callable, Optional
+from collections import deque
+import numpy as np
+import logging
+import time
+
+
+def small_rotation(phi: np.ndarray) -> np.ndarray:
+    '''
+    Rotation matrix for the rotation vector phi (Rodrigues' formula).
+    '''
+    angle = np.linalg.norm(phi)
+    if angle < 1e-12:
+        return np.eye(3)
+    k = phi / angle
+    K = np.array([[0, -k[2], k[1]], [k[2], 0, -k[0]], [-k[1], k[0], 0]])
+    return np.eye(3) + np.sin(angle) * K + (1 - np.cos(angle)) * K @ K
+
+
+class OnlineCalibrator(Thread):
+    '''
+    Background refinement of local_origin and rotation_matrix while tracking runs.
+
+    Each observation pairs points known to lie on the physical beam, such as the
+    calibration target's markers held in the beam, with the pan/tilt the servos report
+    at that moment. The model predicts the beam line from the origin along
+    R * beam_directions(pan, tilt). Every interval seconds a damped Gauss-Newton
+    solve over the sliding window moves the origin and a small rotation of R to
+    minimise the points' perpendicular distances from their predicted lines. The ridge
+    terms keep each step small and keep the solve well posed when the window only
+    covers a few directions.
+
+    The target the tracker aims at cannot serve as an observation by itself. The servos
+    settle wherever the current model sends them, so its residual is always zero.
+
+    Each solve builds a new LocalTransform and hands it to on_update. Consumers swap a
+    single reference, so the control loop sees either the old or the new calibration,
+    never a partial one.
+
+    Parameters:
+    - transform (LocalTransform): Calibration to start from.
+    - on_update (Callable[[LocalTransform], None]): Called from this thread with each refined transform.
+    - window (int): Number of observations in the sliding window.
+    - min_observations (int): Observations needed before refining.
+    - interval (float): Seconds between solves; the thread sleeps in between.
+    - origin_step (float): Expected origin change per solve (mm); sets the origin damping.
+    - rotation_step (float): Expected rotation change per solve (rad); sets the rotation damping.
+    - point_noise (float): Marker and beam position noise (mm).
+    - max_residual (float): Observations further than this from the current model (mm) are ignored.
+    - iterations (int): Gauss-Newton iterations per solve.
+    '''
+    def __init__(self, transform: LocalTransform, on_update: Callable[[LocalTransform], None],
+                 window: int = 300, min_observations: int = 30, interval: float = 1.0,
+                 origin_step: float = 2.0, rotation_step: float = 0.002, point_noise: float = 1.0,
+                 max_residual: float = 30.0, iterations: int = 3) -> None:
+        Thread.__init__(self, daemon=True)
+        self.transform = transform
+        self.on_update = on_update
+        self.min_observations = min_observations
+        self.interval = interval
+        self.max_residual = max_residual
+        self.iterations = iterations
+
+        # Damping in the same units as the normal equations of the point residuals
+        self._damping = np.diag([(point_noise / origin_step) ** 2] * 3 + [(point_noise / rotation_step) ** 2] * 3)
+
+        # deque.append is atomic, so the control loop can add observations without a lock
+        self.observations = deque(maxlen=window)
+        self.rms = None
+        self.updates = 0
+        self._stop_event = Event()
+
+    def add_observation(self, points: np.ndarray, pan: float, tilt: float) -> None:
+        '''
+        Queue points on the beam together with the geometric pan/tilt (degrees) it was at.
+        '''
+        points = np.asarray(points, dtype=float).reshape(-1, 3)
+        self.observations.append((points, beam_directions([pan], [tilt])[0]))
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            if len(self.observations) >= self.min_observations:
+                try:
+                    self.refine()
+                except np.linalg.LinAlgError as e:
+                    logging.warning(f"Online calibration step failed: {e}")
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+    def refine(self) -> Optional[float]:
+        '''
+        Run one sliding-window solve and publish the result.
+
+        Returns:
+        - Optional[float]: RMS point-to-beam distance (mm) after the solve, None if too few observations survived gating.
+        '''
+        observations = list(self.observations)
+        points = np.concatenate([p for p, _ in observations])
+        local_dirs = np.concatenate([np.repeat(d[None], len(p), axis=0) for p, d in observations])
+
+        origin = self.transform.local_origin.copy()
+        rotation = self.transform.rotation_matrix.copy()
+
+        # Gate out observations that disagree grossly with the current model
+        distances = np.linalg.norm(self._residuals(points, local_dirs, origin, rotation)[0], axis=1)
+        keep = distances < self.max_residual
+        if keep.sum() < self.min_observations:
+            return None
+        points, local_dirs = points[keep], local_dirs[keep]
+        rms_before = np.sqrt(np.mean(distances[keep] ** 2))
+
+        identity = np.eye(3)
+        for _ in range(self.iterations):
+            r, w, q, t = self._residuals(points, local_dirs, origin, rotation)
+
+            # dr/do = -(I - w w^T); dr/dphi = t [w]x + w (q x w)^T for a rotation w -> w + phi x w
+            jac_origin = -(identity - w[:, :, None] * w[:, None, :])
+            w_cross = np.zeros((len(w), 3, 3))
+            w_cross[:, 0, 1], w_cross[:, 0, 2] = -w[:, 2], w[:, 1]
+            w_cross[:, 1, 0], w_cross[:, 1, 2] = w[:, 2], -w[:, 0]
+            w_cross[:, 2, 0], w_cross[:, 2, 1] = -w[:, 1], w[:, 0]
+            jac_rotation = t[:, None, None] * w_cross + w[:, :, None] * np.cross(q, w)[:, None, :]
+            jacobian = np.concatenate((jac_origin, jac_rotation), axis=2)
+
+            H = np.einsum('nki,nkj->ij', jacobian, jacobian) + self._damping
+            g = np.einsum('nki,nk->i', jacobian, r)
+            delta = -np.linalg.solve(H, g)
+
+            origin = origin + delta[:3]
+            rotation = small_rotation(delta[3:]) @ rotation
+
+        r = self._residuals(points, local_dirs, origin, rotation)[0]
+        rms = float(np.sqrt(np.mean(np.einsum('ij,ij->i', r, r))))
+        if rms >= rms_before:
+            return rms_before
+
+        # Re-orthonormalise to stop rounding drift over many updates
+        u, _, vh = np.linalg.svd(rotation)
+        rotation = u @ vh
+
+        self.transform = LocalTransform(origin, rotation)
+        self.rms = rms
+        self.updates += 1
+        self.on_update(self.transform)
+        logging.info(f"Online calibration update {self.updates}: RMS {rms_before:.2f} -> {rms:.2f} mm")
+        return rms
+
+    @staticmethod
+    def _residuals(points: np.ndarray, local_dirs: np.ndarray, origin: np.ndarray, rotation: np.ndarray):
+        # Perpendicular offset of each point from its predicted beam line
+        w = local_dirs @ rotation.T
+        q = points - origin
+        t = np.einsum('ij,ij->i', q, w)
+        return q - w * t[:, None], w, q, t
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+
+    # Rig bumped after calibration: recover the true origin and axes from beam observations
+    rng = np.random.default_rng(0)
+    true_origin = np.array([-90.0, 400.0, 660.0])
+    true_rotation = small_rotation(np.array([0.3, -0.2, 1.1]))
+    start = LocalTransform(true_origin + [6.0, -4.0, 3.0], small_rotation(np.array([0.01, -0.008, 0.012])) @ true_rotation)
+
+    calibrator = OnlineCalibrator(start, on_update=lambda transform: None, interval=0.05)
+    calibrator.start()
+    for _ in range(600):
+        pan, tilt = rng.uniform(-40, 40), rng.uniform(-30, 30)
+        beam = true_rotation @ beam_directions([pan], [tilt])[0]
+        points = true_origin + np.outer(rng.uniform(500, 3000, 2), beam) + rng.normal(0, 0.5, (2, 3))
+        calibrator.add_observation(points, pan, tilt)
+        time.sleep(0.002)
+    time.sleep(0.5)
+    calibrator.stop()
+
+    origin_error = np.linalg.norm(calibrator.transform.local_origin - true_origin)
+    rotation_error = np.degrees(np.arccos(np.clip((np.trace(calibrator.transform.rotation_matrix.T @ true_rotation) - 1) / 2, -1, 1)))
+    print(f"{calibrator.updates} updates: origin error {origin_error:.2f} mm, rotation error {rotation_error:.3f} deg")
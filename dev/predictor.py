@@ -0,0 +1,215 @@
+from typing import List, Optional
+import numpy as np
+import logging
+import glob
+import re
+
+# Look-ahead used when no Bode sweep data is available (s)
+DEFAULT_LOOK_AHEAD = 0.03
+
+# Bode sweeps are recorded around these goal angles (deg), see get_theta_bode
+PAN_CENTER = 225
+TILT_CENTER = 315
+
+
+class TargetPredictor:
+    '''
+    Constant-velocity Kalman filter extrapolating the target position past the system latency.
+
+    The three axes share the same dynamics and noise model, so a single 2x2 covariance
+    serves all of them and the filter costs a handful of float operations per frame.
+    Time steps come from the QTM packet timestamps rather than the arrival time, so
+    network and scheduling jitter do not leak into the velocity estimate.
+
+    Parameters:
+    - look_ahead (float): Seconds past the latest measurement to extrapolate to.
+    - process_noise (float): White acceleration spectral density (mm^2/s^3); higher follows manoeuvres faster.
+    - measurement_noise (float): QTM position variance (mm^2).
+    - max_gap (float): Seconds without measurements after which the filter restarts.
+    '''
+    def __init__(self, look_ahead: float = DEFAULT_LOOK_AHEAD, process_noise: float = 5e6,
+                 measurement_noise: float = 0.25, max_gap: float = 0.2) -> None:
+        self.look_ahead = look_ahead
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.max_gap = max_gap
+        self.reset()
+
+    def reset(self) -> None:
+        self.position = None
+        self.velocity = np.zeros(3)
+        self.timestamp = None
+
+        # Shared covariance [[p_pp, p_pv], [p_pv, p_vv]]
+        self._p_pp = 0.0
+        self._p_pv = 0.0
+        self._p_vv = 0.0
+
+    def update(self, timestamp: int, position) -> None:
+        '''
+        Fold in one measurement.
+
+        Parameters:
+        - timestamp (int): QTM frame timestamp in microseconds.
+        - position (array-like): Measured target position (mm).
+        '''
+        z = np.asarray(position, dtype=float)
+
+        dt = None if self.timestamp is None else (timestamp - self.timestamp) * 1e-6
+        if dt is None or dt <= 0 or dt > self.max_gap:
+            # (Re)start: position from the measurement, unknown velocity
+            self.position = z.copy()
+            self.velocity = np.zeros(3)
+            self.timestamp = timestamp
+            self._p_pp = self.measurement_noise
+            self._p_pv = 0.0
+            self._p_vv = 1e6
+            return
+
+        # Predict: x = F x, P = F P F' + Q
+        q = self.process_noise
+        p_pp = self._p_pp + dt * (2 * self._p_pv + dt * self._p_vv) + q * dt ** 3 / 3
+        p_pv = self._p_pv + dt * self._p_vv + q * dt ** 2 / 2
+        p_vv = self._p_vv + q * dt
+        predicted = self.position + dt * self.velocity
+
+        # Update with the position measurement
+        s = p_pp + self.measurement_noise
+        k_p = p_pp / s
+        k_v = p_pv / s
+        innovation = z - predicted
+        self.position = predicted + k_p * innovation
+        self.velocity = self.velocity + k_v * innovation
+
+        self._p_pp = (1 - k_p) * p_pp
+        self._p_pv = (1 - k_p) * p_pv
+        self._p_vv = p_vv - k_v * p_pv
+        self.timestamp = timestamp
+
+    def predict(self, look_ahead: Optional[float] = None) -> Optional[np.ndarray]:
+        '''
+        Extrapolate the filtered state.
+
+        Parameters:
+        - look_ahead (float): Seconds past the latest measurement; defaults to the configured horizon.
+
+        Returns:
+        - np.ndarray: Predicted position (mm), or None before the first measurement.
+        '''
+        if self.position is None:
+            return None
+        if look_ahead is None:
+            look_ahead = self.look_ahead
+        return self.position + look_ahead * self.velocity
+
+
+def estimate_servo_latency(paths: List[str], max_lag: float = 0.2) -> Optional[float]:
+    '''
+    Estimate the servo response delay from get_theta_bode sweeps by cross-correlation.
+
+    Each file holds (time, goal offset, pan position, tilt position); the measured angles
+    are resampled onto a uniform grid and the lag maximising their correlation with the
+    goal is taken as that sweep's delay.
+
+    Parameters:
+    - paths (List[str]): .npz files saved by get_theta_bode.
+    - max_lag (float): Largest delay considered (s).
+
+    Returns:
+    - Optional[float]: Median delay across sweeps and both axes (s), or None without usable data.
+    '''
+    delays = []
+    for path in paths:
+        data = np.load(path)
+        if not _is_theta_sweep(data):
+            logging.warning(f"Skipping {path}: not a get_theta_bode position sweep.")
+            continue
+        t, goal = data['arr_0'], data['arr_1'].astype(float)
+        if len(t) < 100:
+            continue
+
+        # Uniform grid at the mean sample interval
+        dt = (t[-1] - t[0]) / (len(t) - 1)
+        grid = np.arange(t[0], t[-1], dt)
+        goal = np.interp(grid, t, goal)
+        goal -= goal.mean()
+        max_shift = min(int(max_lag / dt), len(grid) // 2)
+
+        for measured, center in ((data['arr_2'], PAN_CENTER), (data['arr_3'], TILT_CENTER)):
+            response = np.interp(grid, t, measured - center)
+            response -= response.mean()
+
+            # Correlation of goal(t) with response(t + lag) for lag >= 0
+            n = len(grid)
+            correlation = [np.dot(goal[:n - shift], response[shift:]) for shift in range(max_shift)]
+            delays.append(np.argmax(correlation) * dt)
+
+    if not delays:
+        return None
+    return float(np.median(delays))
+
+
+def _is_theta_sweep(data) -> bool:
+    # (time, goal offset, pan, tilt): equal-length 1-D arrays, increasing time,
+    # goal offsets within the +-30 deg sweep and positions around the sweep centres
+    if sorted(data.files) != ['arr_0', 'arr_1', 'arr_2', 'arr_3']:
+        return False
+    arrays = [data[f'arr_{i}'] for i in range(4)]
+    if any(a.ndim != 1 or len(a) != len(arrays[0]) for a in arrays) or len(arrays[0]) < 2:
+        return False
+    t, goal, pan, tilt = arrays
+    return (np.all(np.diff(t) > 0) and np.abs(goal).max() <= 45
+            and np.abs(pan - PAN_CENTER).max() <= 90 and np.abs(tilt - TILT_CENTER).max() <= 90)
+
+
+def _frequency_of(path: str) -> float:
+    match = re.search(r'theta_([\d.]+)Hz', path)
+    return float(match.group(1)) if match else float('inf')
+
+
+def estimate_look_ahead(data_dir: str = 'data', transport_latency: float = 0.005,
+                        max_frequency: float = 3.0) -> float:
+    '''
+    Look-ahead horizon from the recorded Bode sweeps plus the mocap/bus transport delay.
+
+    Only sweeps up to max_frequency are used; above that the response amplitude is too
+    small for a reliable correlation peak.
+
+    Parameters:
+    - data_dir (str): Directory holding get_theta_bode output.
+    - transport_latency (float): QTM-to-command delay not covered by the sweeps (s).
+    - max_frequency (float): Highest sweep frequency included (Hz).
+
+    Returns:
+    - float: Horizon in seconds; DEFAULT_LOOK_AHEAD if no sweep data is found.
+    '''
+    paths = [p for p in glob.glob(f'{data_dir}/theta_*Hz.npz') if _frequency_of(p) <= max_frequency]
+    servo_latency = estimate_servo_latency(paths)
+    if servo_latency is None:
+        logging.warning(f"No Bode data in {data_dir}; using default look-ahead of {DEFAULT_LOOK_AHEAD} s.")
+        return DEFAULT_LOOK_AHEAD
+
+    logging.info(f"Servo latency from Bode data: {servo_latency * 1e3:.1f} ms")
+    return servo_latency + transport_latency
+
+
+if __name__ == '__main__':
+    # Smoothly moving target sampled at 300 Hz with QTM-like noise; compare aiming error
+    rng = np.random.default_rng(0)
+    look_ahead = 0.03
+    predictor = TargetPredictor(look_ahead)
+
+    raw_errors = []
+    predicted_errors = []
+    for i in range(3000):
+        t = i / 300
+        truth = np.array([1000 * np.sin(t), 500 * np.cos(0.7 * t), 200.0])
+        predictor.update(int(t * 1e6), truth + rng.normal(0, 0.5, 3))
+
+        future = np.array([1000 * np.sin(t + look_ahead), 500 * np.cos(0.7 * (t + look_ahead)), 200.0])
+        if i > 30:
+            raw_errors.append(np.linalg.norm(truth - future))
+            predicted_errors.append(np.linalg.norm(predictor.predict() - future))
+
+    print(f"Mean error {look_ahead * 1e3:.0f} ms ahead: last sample {np.mean(raw_errors):.2f} mm, "
+          f"predicted {np.mean(predicted_errors):.2f} mm")
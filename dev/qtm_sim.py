@@ -0,0 +1,432 @@
+from typing import List, Optional
+import multiprocessing
+import argparse
+import asyncio
+import logging
+import struct
+import time
+
+import numpy as np
+
+# QTM RT packet types
+PACKET_ERROR = 0
+PACKET_COMMAND = 1
+PACKET_XML = 2
+PACKET_DATA = 3
+PACKET_NO_MORE_DATA = 4
+
+# QTM RT component types
+COMPONENT_3D = 1
+COMPONENT_3D_NO_LABELS = 2
+COMPONENT_6D = 5
+
+RT_HEADER = struct.Struct('<II')                # size, type
+RT_DATA_HEADER = struct.Struct('<qII')          # timestamp (us), frame number, component count
+RT_COMPONENT_HEADER = struct.Struct('<II')      # size, type
+RT_COMPONENT_INFO = struct.Struct('<Ihh')       # count, 2D drop rate, 2D out of sync rate
+
+MARKER_NO_LABEL_DTYPE = np.dtype([('x', '<f4'), ('y', '<f4'), ('z', '<f4'), ('id', '<i4')])
+MARKER_DTYPE = np.dtype([('x', '<f4'), ('y', '<f4'), ('z', '<f4')])
+BODY_DTYPE = np.dtype([('position', '<f4', 3), ('matrix', '<f4', 9)])
+
+QTM_RT_PORT = 22223
+
+
+class SyntheticSource:
+    """
+    Generate a target marker moving on a 3D Lissajous path plus optional extra markers.
+
+    The second marker sits at a fixed offset from the first, like the laser/calibration
+    marker pair used during calibration; any further markers are static clutter.
+
+    :param num_markers: Markers per frame
+    :param center: Centre of the trajectory in mm
+    :param amplitude: Per-axis amplitude of the trajectory in mm
+    :param frequency: Per-axis frequency of the trajectory in Hz
+    :param noise: Standard deviation of marker noise in mm
+    :param seed: Random seed for noise and clutter placement
+    """
+    def __init__(self, num_markers: int = 2, center=(0.0, 2000.0, 1000.0), amplitude=(800.0, 300.0, 400.0),
+                 frequency=(0.31, 0.47, 0.23), noise: float = 0.2, seed: int = 0):
+        self.num_markers = num_markers
+        self.center = np.asarray(center, dtype=float)
+        self.amplitude = np.asarray(amplitude, dtype=float)
+        self.omega = 2 * np.pi * np.asarray(frequency, dtype=float)
+        self.noise = noise
+        self.rng = np.random.default_rng(seed)
+
+        # Calibration marker offset from the target and static clutter positions
+        self.offsets = np.array([[0.0, 0.0, 0.0], [0.0, 150.0, 0.0]])[:num_markers]
+        self.clutter = self.center + self.rng.uniform(-1500, 1500, (max(0, num_markers - 2), 3))
+
+    def markers(self, t: float) -> np.ndarray:
+        """
+        :param t: Time since the start of the stream in seconds
+        :return: (M, 3) marker positions in mm
+        """
+        target = self.center + self.amplitude * np.sin(self.omega * t)
+        markers = np.empty((self.num_markers, 3))
+        markers[:2] = target + self.offsets
+        markers[2:] = self.clutter
+        if self.noise:
+            markers += self.rng.normal(0.0, self.noise, markers.shape)
+        return markers
+
+
+class RecordedSource:
+    """
+    Replay a recorded marker session.
+
+    Sessions are .npz files with `markers`, an (F, M, 3) array in mm where missing markers
+    are NaN, and optionally `timestamps` in microseconds. Playback loops at the end.
+
+    :param path: Path to the session file
+    """
+    def __init__(self, path: str):
+        session = np.load(path)
+        self.frames = session['markers'].astype(float)
+        if 'timestamps' in session:
+            timestamps = session['timestamps'].astype(float) * 1e-6
+            self.times = timestamps - timestamps[0]
+        else:
+            self.times = None
+        self.num_markers = self.frames.shape[1]
+        self._index = 0
+
+    @property
+    def native_rate(self) -> Optional[float]:
+        if self.times is None or len(self.times) < 2:
+            return None
+        return (len(self.times) - 1) / (self.times[-1] - self.times[0])
+
+    def markers(self, t: float) -> np.ndarray:
+        if self.times is not None:
+            duration = self.times[-1] + (self.times[-1] - self.times[-2] if len(self.times) > 1 else 0.0)
+            index = int(np.searchsorted(self.times, t % duration if duration else 0.0, side='right')) - 1
+        else:
+            index = self._index
+            self._index += 1
+        frame = self.frames[index % len(self.frames)]
+        return frame[~np.isnan(frame).any(axis=1)]
+
+
+def build_data_packet(frame_number: int, timestamp_us: int, components: List[str], markers: np.ndarray) -> bytes:
+    """
+    Build a QTM RT data packet for the requested components.
+
+    The first marker doubles as the single 6DoF body, with an identity rotation.
+
+    :param frame_number: QTM frame number
+    :param timestamp_us: Frame timestamp in microseconds
+    :param components: Lower-case component names, e.g. ['3dnolabels']
+    :param markers: (M, 3) marker positions in mm
+    :return: Packet bytes including the RT header
+    """
+    blocks = []
+    for component in components:
+        if component == '3dnolabels':
+            data = np.zeros(len(markers), dtype=MARKER_NO_LABEL_DTYPE)
+            data['x'], data['y'], data['z'] = markers.T
+            data['id'] = np.arange(1, len(markers) + 1)
+            component_type = COMPONENT_3D_NO_LABELS
+        elif component == '3d':
+            data = np.zeros(len(markers), dtype=MARKER_DTYPE)
+            data['x'], data['y'], data['z'] = markers.T
+            component_type = COMPONENT_3D
+        elif component == '6d':
+            data = np.zeros(1 if len(markers) else 0, dtype=BODY_DTYPE)
+            if len(markers):
+                data['position'] = markers[0]
+                data['matrix'] = np.eye(3).ravel()
+            component_type = COMPONENT_6D
+        else:
+            continue
+
+        payload = RT_COMPONENT_INFO.pack(len(data), 0, 0) + data.tobytes()
+        blocks.append(RT_COMPONENT_HEADER.pack(RT_COMPONENT_HEADER.size + len(payload), component_type) + payload)
+
+    body = RT_DATA_HEADER.pack(timestamp_us, frame_number, len(blocks)) + b''.join(blocks)
+    return RT_HEADER.pack(RT_HEADER.size + len(body), PACKET_DATA) + body
+
+
+def build_parameters_xml(parameters: List[str], num_markers: int) -> str:
+    sections = []
+    if 'all' in parameters or 'general' in parameters:
+        sections.append("<General><Frequency>1000</Frequency></General>")
+    if 'all' in parameters or '3d' in parameters:
+        labels = "".join(f"<Label><Name>marker_{i + 1}</Name><RGBColor>16777215</RGBColor></Label>" for i in range(num_markers))
+        sections.append(f"<The_3D><AxisUpwards>+Z</AxisUpwards><Labels>{num_markers}</Labels>{labels}</The_3D>")
+    if 'all' in parameters or '6d' in parameters:
+        sections.append("<The_6D><Bodies>1</Bodies><Body><Name>target</Name><RGBColor>16777215</RGBColor></Body></The_6D>")
+    return f'<QTM_Parameters_Ver_1.24>{"".join(sections)}</QTM_Parameters_Ver_1.24>'
+
+
+class QTMSimProtocol(asyncio.Protocol):
+    """
+    One client connection to the stand-in QTM RT server.
+    """
+    def __init__(self, server: 'QTMSimServer'):
+        self.server = server
+        self.transport = None
+        self._received = b''
+
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+        logging.info('[QTM sim] Client connected')
+        self._send(PACKET_COMMAND, 'QTM RT Interface connected')
+
+    def connection_lost(self, exc) -> None:
+        self._stop_stream()
+        logging.info('[QTM sim] Client disconnected')
+
+    def data_received(self, data: bytes) -> None:
+        self._received += data
+        while len(self._received) >= RT_HEADER.size:
+            size, packet_type = RT_HEADER.unpack_from(self._received)
+            if len(self._received) < size:
+                break
+            payload = self._received[RT_HEADER.size:size]
+            self._received = self._received[size:]
+            if packet_type == PACKET_COMMAND:
+                self._on_command(payload.rstrip(b'\0').decode(errors='replace'))
+
+    def _send(self, packet_type: int, text: str) -> None:
+        payload = text.encode() + b'\0'
+        self.transport.write(RT_HEADER.pack(RT_HEADER.size + len(payload), packet_type) + payload)
+
+    def _on_command(self, command: str) -> None:
+        logging.debug('[QTM sim] R: %s', command)
+        words = command.lower().split()
+        if not words:
+            return
+
+        if words[0] == 'version' and len(words) > 1:
+            self._send(PACKET_COMMAND, f'Version set to {words[1]}')
+        elif words[0] == 'qtmversion':
+            self._send(PACKET_COMMAND, 'QTM Version is 2.0 (simulated)')
+        elif words[0] == 'byteorder':
+            self._send(PACKET_COMMAND, 'Byte order is little endian')
+        elif words[0] == 'getparameters':
+            self._send(PACKET_XML, build_parameters_xml(words[1:] or ['all'], self.server.source.num_markers))
+        elif words[0] == 'getcurrentframe':
+            markers = self.server.source.markers(time.perf_counter() - self.server.start_time)
+            self.transport.write(build_data_packet(self.server.frame_number, self.server.timestamp_us(), words[1:], markers))
+        elif words[0] == 'streamframes' and len(words) > 1 and words[1] == 'stop':
+            self._stop_stream()
+        elif words[0] == 'streamframes' and len(words) > 2:
+            divisor = 1
+            if words[1].startswith('frequency:'):
+                divisor = max(round(self.server.rate_hz / float(words[1].split(':')[1])), 1)
+            elif words[1].startswith('frequencydivisor:'):
+                divisor = max(int(words[1].split(':')[1]), 1)
+            self.server.streams[self] = (divisor, words[2:])
+        else:
+            self._send(PACKET_ERROR, 'Parse error')
+
+    def _stop_stream(self) -> None:
+        self.server.streams.pop(self, None)
+
+
+class QTMSimServer:
+    """
+    Local stand-in for the QTM RT server.
+
+    Implements enough of the RT protocol (version, getparameters, getcurrentframe,
+    streamframes for 3d, 3dnolabels and 6d) to drive MoCap and the qtm SDK unchanged.
+    Frame timestamps are time.perf_counter in microseconds, so a client on the same
+    machine can measure end-to-end latency directly from each frame.
+
+    :param source: SyntheticSource or RecordedSource providing marker positions
+    :param rate_hz: Default streaming rate
+    :param dropout: Probability that a frame carries no markers (occlusion)
+    :param packet_loss: Probability that a frame is not sent at all
+    :param host: Interface to listen on
+    :param port: TCP port; 22223 is the little-endian QTM RT port
+    """
+    def __init__(self, source=None, rate_hz: float = 300, dropout: float = 0.0, packet_loss: float = 0.0,
+                 host: str = '127.0.0.1', port: int = QTM_RT_PORT, seed: int = 0):
+        self.source = source if source is not None else SyntheticSource()
+        self.rate_hz = rate_hz
+        self.dropout = dropout
+        self.packet_loss = packet_loss
+        self.host = host
+        self.port = port
+        self.rng = np.random.default_rng(seed)
+
+        self.start_time = time.perf_counter()
+        self.frame_number = 0
+        self.packets_sent = 0
+        self.packets_dropped = 0
+
+        # Streaming connections: protocol -> (frequency divisor, components)
+        self.streams = {}
+
+    def timestamp_us(self) -> int:
+        return int(time.perf_counter() * 1e6)
+
+    async def _clock(self) -> None:
+        """
+        Advance the frame counter once per tick and send that frame to every streaming client,
+        so all connections see the same frame numbers, as with a real QTM.
+        """
+        loop = asyncio.get_event_loop()
+        period = 1.0 / self.rate_hz
+        deadline = loop.time()
+
+        while True:
+            self.frame_number += 1
+            t = time.perf_counter() - self.start_time
+
+            if self.streams:
+                markers = self.source.markers(t)
+                # Occlusion: the frame arrives but the markers are missing
+                if self.dropout and self.rng.random() < self.dropout:
+                    markers = markers[:0]
+                timestamp = self.timestamp_us()
+
+                for protocol, (divisor, components) in list(self.streams.items()):
+                    if self.frame_number % divisor or protocol.transport is None or protocol.transport.is_closing():
+                        continue
+                    # Whole packets lost in transit: frame numbers skip ahead
+                    if self.packet_loss and self.rng.random() < self.packet_loss:
+                        self.packets_dropped += 1
+                        continue
+                    protocol.transport.write(build_data_packet(self.frame_number, timestamp, components, markers))
+                    self.packets_sent += 1
+
+            # Absolute deadlines keep the average rate exact despite sleep granularity
+            deadline += period
+            delay = deadline - loop.time()
+            if delay < -10 * period:
+                deadline = loop.time()
+                delay = 0
+            await asyncio.sleep(max(0.0, delay))
+
+    async def serve_forever(self, ready=None) -> None:
+        clock = asyncio.get_event_loop().create_task(self._clock())
+        server = await asyncio.get_event_loop().create_server(lambda: QTMSimProtocol(self), self.host, self.port)
+        logging.info('[QTM sim] Listening on %s:%d at %.0f Hz', self.host, self.port, self.rate_hz)
+        if ready is not None:
+            ready.set()
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            clock.cancel()
+
+
+def run_server(rate_hz: float = 300, dropout: float = 0.0, packet_loss: float = 0.0, num_markers: int = 2,
+               session: Optional[str] = None, host: str = '127.0.0.1', port: int = QTM_RT_PORT, ready=None) -> None:
+    source = RecordedSource(session) if session else SyntheticSource(num_markers)
+    server = QTMSimServer(source, rate_hz, dropout, packet_loss, host, port)
+    try:
+        asyncio.run(server.serve_forever(ready))
+    except KeyboardInterrupt:
+        pass
+
+
+def start_sim_server(**kwargs) -> multiprocessing.Process:
+    """
+    Start the stand-in server in a separate process so it does not share the client's GIL.
+    """
+    ready = multiprocessing.Event()
+    process = multiprocessing.Process(target=run_server, kwargs=dict(kwargs, ready=ready), daemon=True)
+    process.start()
+    if not ready.wait(timeout=10):
+        process.terminate()
+        raise RuntimeError("QTM simulator failed to start.")
+    return process
+
+
+async def record_session(path: str, qtm_ip: str = '192.168.100.1', duration: float = 10.0) -> None:
+    """
+    Record unlabelled 3D markers from a real QTM into a session file for replay.
+    """
+    import qtm
+
+    timestamps = []
+    frames = []
+
+    def on_packet(packet):
+        _, markers = packet.get_3d_markers_no_label()
+        timestamps.append(packet.timestamp)
+        frames.append([(m.x, m.y, m.z) for m in markers])
+
+    connection = await qtm.connect(qtm_ip)
+    await connection.stream_frames(components=['3dnolabels'], on_packet=on_packet)
+    await asyncio.sleep(duration)
+    await connection.stream_frames_stop()
+    connection.disconnect()
+
+    # Pad to the largest marker count with NaN
+    width = max((len(f) for f in frames), default=0)
+    markers = np.full((len(frames), width, 3), np.nan)
+    for i, frame in enumerate(frames):
+        markers[i, :len(frame)] = frame
+    np.savez(path, timestamps=np.array(timestamps, dtype=np.int64), markers=markers)
+
+
+def benchmark(rate_hz: float = 1000, duration: float = 5.0, dropout: float = 0.0, num_markers: int = 2) -> None:
+    """
+    Measure MoCap packet handling cost and end-to-end latency against the stand-in server.
+    """
+    from mocap_stream import MoCap
+    from qtm.packet import QRTPacket
+
+    # Packet handling throughput: MoCap._on_packet on prebuilt packets, no network or thread
+    source = SyntheticSource(num_markers)
+    packets = [QRTPacket(build_data_packet(i, i * 1000, ['3dnolabels'], source.markers(i * 1e-3))[RT_HEADER.size:])
+               for i in range(2000)]
+    probe = MoCap(stream_type='3d', start=False)
+    start = time.perf_counter()
+    for packet in packets:
+        probe._on_packet(packet)
+    handling = (time.perf_counter() - start) / len(packets)
+    print(f"MoCap._on_packet: {handling * 1e6:.1f} us/packet ({1 / handling:,.0f} packets/s) with {num_markers} markers")
+
+    # End-to-end: server process -> TCP -> qtm SDK -> MoCap -> consumer wake-up
+    server = start_sim_server(rate_hz=rate_hz, dropout=dropout, num_markers=num_markers)
+    target = MoCap(qtm_ip='127.0.0.1', stream_type='3d')
+
+    latencies = []
+    received = 0
+    skipped = 0
+    last_frame_number = None
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        frame = target.wait_for_frame(last_frame_number, timeout=0.5)
+        if frame is None:
+            continue
+        latencies.append(time.perf_counter() * 1e6 - frame.timestamp)
+        if last_frame_number is not None and frame.frame_number > last_frame_number + 1:
+            skipped += frame.frame_number - last_frame_number - 1
+        last_frame_number = frame.frame_number
+        received += 1
+
+    target.close()
+    server.terminate()
+
+    if latencies:
+        p50, p99 = np.percentile(latencies, [50, 99])
+        print(f"Streamed at {rate_hz:.0f} Hz for {duration:.0f} s: {received / duration:.0f} frames/s handled, "
+              f"{skipped} frames not seen by the consumer")
+        print(f"Server-to-consumer latency: median {p50:.0f} us, p99 {p99:.0f} us")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Stand-in QTM RT server")
+    parser.add_argument("command", choices=["serve", "bench"])
+    parser.add_argument("--rate", type=float, default=300, help="frame rate in Hz")
+    parser.add_argument("--dropout", type=float, default=0.0, help="probability of a frame without markers")
+    parser.add_argument("--packet-loss", type=float, default=0.0, help="probability of a frame not being sent")
+    parser.add_argument("--markers", type=int, default=2, help="synthetic marker count")
+    parser.add_argument("--session", help="recorded .npz session to replay")
+    parser.add_argument("--duration", type=float, default=5.0, help="benchmark duration in seconds")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.command == "serve" else logging.ERROR)
+
+    if args.command == "serve":
+        run_server(args.rate, args.dropout, args.packet_loss, args.markers, args.session)
+    else:
+        benchmark(args.rate, args.duration, args.dropout, args.markers)
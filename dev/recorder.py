@@ -0,0 +1,191 @@
+from threading import Thread, Condition
+from typing import Callable, Dict, Optional
+from collections import deque, namedtuple
+from frame_store import FrameStoreWriter
+import numpy as np
+import logging
+import time
+import os
+import cv2
+
+RecordItem = namedtuple('RecordItem', ['frame_id', 'timestamp', 'frame', 'release'])
+
+
+class FrameRecorder:
+    """
+    Bounded image recorder with a pool of writer threads.
+
+    submit() puts frames on a queue of at most queue_size entries. When the queue is
+    full, the policy decides what happens:
+    - 'block': wait for a writer to make room, which pushes back on the capture loop.
+    - 'drop_oldest': discard the oldest queued frame to keep the newest.
+    - 'drop_newest': discard the submitted frame to keep what is already queued.
+
+    Each worker takes up to batch_size frames per lock acquisition and writes them
+    with cv2.imwrite; cv2 releases the GIL while encoding, so the workers overlap.
+    Files are named <prefix>_<session>_<frame id>, with frame IDs increasing
+    monotonically, so names never collide. A frame's release callback runs once it
+    is written or dropped, which lets frames borrowed from a FrameBufferRing go back to
+    the ring.
+
+    With container=True the frames are instead appended raw to a single
+    <prefix>_<session>.frames file (see frame_store) by one worker, avoiding per-file
+    and encoding overhead. A new numbered container is started if the frame shape
+    changes.
+    :param folder: Output folder, created if missing
+    :param num_workers: Writer threads
+    :param queue_size: Max frames waiting to be written
+    :param policy: 'block', 'drop_oldest' or 'drop_newest'
+    :param batch_size: Frames a worker takes from the queue at once
+    :param extension: Image format by file extension, e.g. '.bmp' or '.png'
+    :param prefix: File name prefix
+    :param container: Append raw frames to one container file instead of writing images
+    """
+    def __init__(self, folder: str = "images", num_workers: int = 2, queue_size: int = 16, policy: str = 'drop_oldest',
+                 batch_size: int = 4, extension: str = '.bmp', prefix: str = 'image', container: bool = False):
+        if policy not in ('block', 'drop_oldest', 'drop_newest'):
+            raise ValueError(f"Unknown recording policy: {policy}")
+        self.folder = folder
+        self.queue_size = queue_size
+        self.policy = policy
+        self.batch_size = batch_size
+        self.extension = extension
+        self.prefix = f"{prefix}_{time.strftime('%Y%m%d-%H%M%S')}"
+        os.makedirs(folder, exist_ok=True)
+
+        # Appends to a container must stay in order, so it gets a single writer
+        self.container = container
+        self.store = None
+        self.segments = 0
+        if container:
+            num_workers = 1
+
+        self._queue = deque()
+        self._cond = Condition()
+        self._closing = False
+        self._next_id = 0
+
+        # Counters
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.bytes_written = 0
+        self._start_time = time.perf_counter()
+
+        self.workers = [Thread(target=self._work, daemon=True) for _ in range(num_workers)]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, frame: np.ndarray, frame_id: Optional[int] = None, timestamp: Optional[float] = None,
+               release: Optional[Callable[[], None]] = None) -> bool:
+        """
+        Queue a frame for writing. The frame must not change until release is called.
+        :param frame: Image to write
+        :param frame_id: Monotonic ID, e.g. the ring's frame number; None to number frames here
+        :param timestamp: Capture time stored with the frame, defaults to now
+        :param release: Called once the frame is written or dropped
+        :return: True if the frame was queued, False if it was dropped
+        """
+        dropped = None
+        with self._cond:
+            if self._closing:
+                raise RuntimeError("Recorder is closed.")
+            if frame_id is None:
+                frame_id = self._next_id
+            self._next_id = max(self._next_id, frame_id + 1)
+            item = RecordItem(frame_id, time.perf_counter() if timestamp is None else timestamp, frame, release)
+            self.submitted += 1
+
+            if len(self._queue) >= self.queue_size:
+                if self.policy == 'block':
+                    self._cond.wait_for(lambda: len(self._queue) < self.queue_size)
+                elif self.policy == 'drop_oldest':
+                    dropped = self._queue.popleft()
+                else:
+                    dropped = item
+                self.dropped += dropped is not None
+
+            if dropped is not item:
+                self._queue.append(item)
+                self._cond.notify_all()
+
+        # Hand dropped frames back outside the lock
+        if dropped is not None and dropped.release is not None:
+            dropped.release()
+        return dropped is not item
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or self._closing)
+                if not self._queue:
+                    return
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                self._cond.notify_all()
+
+            for item in batch:
+                self._write(item)
+
+    def _write(self, item: RecordItem) -> None:
+        filename = os.path.join(self.folder, f"{self.prefix}_{item.frame_id:08d}{self.extension}")
+        try:
+            if self.container:
+                self._append(item)
+            elif not cv2.imwrite(filename, item.frame):
+                raise IOError(f"cv2.imwrite failed for {filename}")
+            with self._cond:
+                self.written += 1
+                self.bytes_written += item.frame.nbytes
+        except Exception as e:
+            logging.error(f"Error saving frame {item.frame_id}: {e}")
+            with self._cond:
+                self.failed += 1
+        finally:
+            if item.release is not None:
+                item.release()
+
+    def _append(self, item: RecordItem) -> None:
+        frame = item.frame
+        if self.store is not None and (self.store.shape != frame.shape or self.store.dtype != frame.dtype):
+            self.store.close()
+            self.store = None
+        if self.store is None:
+            suffix = f"_{self.segments}" if self.segments else ""
+            path = os.path.join(self.folder, f"{self.prefix}{suffix}.frames")
+            self.store = FrameStoreWriter(path, frame.shape, frame.dtype)
+            self.segments += 1
+        self.store.append(frame, item.frame_id, item.timestamp)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        :return: Frame counters, queue depth and throughput since the recorder started
+        """
+        elapsed = max(time.perf_counter() - self._start_time, 1e-9)
+        with self._cond:
+            return {
+                'submitted': self.submitted,
+                'written': self.written,
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'queued': len(self._queue),
+                'fps': self.written / elapsed,
+                'mb_per_s': self.bytes_written / elapsed / 1e6,
+            }
+
+    def close(self) -> None:
+        """
+        Write everything still queued, then stop the workers.
+        """
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        for worker in self.workers:
+            worker.join()
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+        stats = self.stats()
+        logging.info(f"Recorder closed: {stats['written']} written, {stats['dropped']} dropped, "
+                     f"{stats['failed']} failed, {stats['fps']:.1f} fps, {stats['mb_per_s']:.1f} MB/s")
@@ -0,0 +1,224 @@
+from multiprocessing import shared_memory
+from mocap_stream import FRAME_DTYPE, SEQUENCE, FrameSnapshot, MocapFrame
+from typing import List, Optional, Tuple
+import numpy as np
+import logging
+import struct
+import time
+
+# Ring header: slot count and total number of frames ever published
+RING_HEADER = struct.Struct('<QQ')
+
+
+class FrameRing:
+    """
+    Single-producer, multi-consumer ring of mocap frames in shared memory.
+
+    Each slot is a FrameSnapshot (seqlock + FRAME_DTYPE record) so readers in any process
+    get consistent records without locks. The producer writes a slot, then advances the
+    published count in the header. A slot's sequence counter also tells a reader whether
+    a frame it wants has since been overwritten.
+
+    One process creates the ring with FrameRing.create() and owns it; other processes
+    attach with FrameRing(name).
+    :param name: Name of an existing shared memory block
+    """
+    def __init__(self, name: str, _shm: Optional[shared_memory.SharedMemory] = None):
+        self._owner = _shm is not None
+        self.shm = _shm if _shm is not None else shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.buffer = self.shm.buf
+
+        self.num_slots = RING_HEADER.unpack_from(self.buffer)[0]
+        self.slots = [FrameSnapshot(self.buffer[self._slot_offset(i):self._slot_offset(i + 1)])
+                      for i in range(self.num_slots)]
+
+    @classmethod
+    def create(cls, num_slots: int = 256, name: Optional[str] = None) -> 'FrameRing':
+        """
+        Allocate a new ring in shared memory.
+        :param num_slots: Number of frames kept for consumers that read every frame
+        :param name: Shared memory name, None for a random one
+        """
+        size = RING_HEADER.size + num_slots * FrameSnapshot.size
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        shm.buf[:size] = bytes(size)
+        RING_HEADER.pack_into(shm.buf, 0, num_slots, 0)
+        return cls(shm.name, _shm=shm)
+
+    @staticmethod
+    def _slot_offset(index: int) -> int:
+        return RING_HEADER.size + index * FrameSnapshot.size
+
+    @property
+    def count(self) -> int:
+        """
+        Total number of frames published so far.
+        """
+        return SEQUENCE.unpack_from(self.buffer, 8)[0]
+
+    def publish(self, frame_number: int, timestamp: int, lost: bool, position, position2, matrix) -> None:
+        """
+        Write the next frame. Must only be called by the single producer.
+        """
+        count = self.count
+        self.slots[count % self.num_slots].publish(frame_number, timestamp, lost, position, position2, matrix)
+        SEQUENCE.pack_into(self.buffer, 8, count + 1)
+
+    def latest(self) -> Optional[np.void]:
+        """
+        Consistent copy of the newest frame, or None if nothing has been published.
+        """
+        count = self.count
+        if count == 0:
+            return None
+        return self.slots[(count - 1) % self.num_slots].read()
+
+    def read(self, index: int) -> Optional[np.void]:
+        """
+        Consistent copy of the frame with the given publish index.
+        :return: The record, or None if it is not published yet or was overwritten
+        """
+        slot = self.slots[index % self.num_slots]
+
+        # A slot holding write number k has sequence 2k once the write is complete
+        expected = 2 * (index // self.num_slots + 1)
+        sequence, record = slot.read_sequenced()
+        if sequence != expected:
+            return None
+        return record
+
+    def read_since(self, cursor: int) -> Tuple[List[np.void], int]:
+        """
+        Every frame published since cursor, for loggers that must not skip frames.
+        :param cursor: Publish index to start from, 0 for the oldest available
+        :return: Records still in the ring, and the cursor to pass next time
+        """
+        count = self.count
+        records = []
+        for index in range(max(cursor, count - self.num_slots), count):
+            record = self.read(index)
+            if record is not None:
+                records.append(record)
+        return records, count
+
+    def close(self) -> None:
+        """
+        Detach from the ring; the creating process also frees it.
+        """
+        self.slots = []
+        self.buffer = None
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
+
+
+class SharedMocapSource:
+    """
+    Read side of a FrameRing with the same consumer interface as MoCap.
+
+    Lets a tracker or logger in another process follow the GUI's MoCap ingest instead of
+    opening its own QTM connection.
+    :param ring_name: Name of the FrameRing created by the MoCap owner
+    :param spin_time: Seconds to spin either side of the next expected frame
+    :param poll_interval: Seconds to sleep between checks outside the spin window
+    """
+    def __init__(self, ring_name: str, spin_time: float = 0.0005, poll_interval: float = 0.001):
+        self.ring = FrameRing(ring_name)
+        self.spin_time = spin_time
+        self.poll_interval = poll_interval
+
+        # Arrival time (perf_counter) and QTM timestamp of the last new frame, and the frame period (s)
+        self._arrival = None
+        self._last = None
+        self.period = None
+
+    @property
+    def position(self) -> np.ndarray:
+        return self._latest()['position']
+
+    @property
+    def position2(self) -> np.ndarray:
+        return self._latest()['position2']
+
+    @property
+    def lost(self) -> bool:
+        return bool(self._latest()['lost'])
+
+    def _latest(self) -> np.void:
+        record = self.ring.latest()
+        if record is None:
+            return np.zeros((), dtype=FRAME_DTYPE)[()]
+        return record
+
+    def wait_for_frame(self, last_frame_number: Optional[int] = None, timeout: Optional[float] = None) -> Optional[MocapFrame]:
+        """
+        Block until a frame newer than last_frame_number has been published.
+
+        The wait sleeps until spin_time before the next frame is due, one period after the
+        last one arrived, then spins on the ring's publish count until spin_time after it.
+        A frame that is late, or a stream that has stopped, is polled every poll_interval,
+        so the reader never spins for more than 2 * spin_time per frame.
+        :param last_frame_number: Frame number last handled by the caller
+        :param timeout: Seconds to wait, 0 to poll, None to wait forever
+        :return: Newest MocapFrame, or None on timeout
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        count = None
+        while True:
+            if self.ring.count != count:
+                count = self.ring.count
+                record = self.ring.latest()
+                if record is not None and record['frame_number'] != last_frame_number:
+                    self._arrived(record)
+                    return MocapFrame(int(record['frame_number']), int(record['timestamp']), bool(record['lost']),
+                                      record['position'], record['position2'])
+            now = time.perf_counter()
+            if deadline is not None and now >= deadline:
+                return None
+
+            delay = self.poll_interval
+            if self.period is not None:
+                until_due = self._arrival + self.period - now
+                if abs(until_due) < self.spin_time:
+                    delay = 0
+                elif until_due > 0:
+                    delay = min(delay, until_due - self.spin_time)
+            if deadline is not None:
+                delay = min(delay, max(deadline - now, 0))
+            time.sleep(delay)
+
+    def _arrived(self, record: np.void) -> None:
+        # Period from the QTM timestamps (us) of consecutive frames seen by this reader
+        frame_number, timestamp = int(record['frame_number']), int(record['timestamp'])
+        if self._last is not None and frame_number > self._last[0] and timestamp > self._last[1]:
+            self.period = (timestamp - self._last[1]) / (frame_number - self._last[0]) * 1e-6
+        self._last = (frame_number, timestamp)
+        self._arrival = time.perf_counter()
+
+    def close(self) -> None:
+        self.ring.close()
+
+
+if __name__ == '__main__':
+    from mocap_stream import MoCap
+    logging.basicConfig(level=logging.INFO)
+
+    # Stream into a ring and follow it through the shared memory reader
+    ring = FrameRing.create()
+    target = MoCap(stream_type='3d', ring=ring)
+    source = SharedMocapSource(ring.name)
+
+    try:
+        last_frame_number = None
+        while True:
+            frame = source.wait_for_frame(last_frame_number, timeout=1.0)
+            if frame is None:
+                logging.warning('No frames in ring.')
+                continue
+            last_frame_number = frame.frame_number
+            print(f"{frame.frame_number}: {frame.position}")
+    except KeyboardInterrupt:
+        source.close()
+        target.close()
+        ring.close()
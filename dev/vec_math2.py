@@ -1,84 +1,353 @@
-from scipy.optimize import fsolve, minimize
-from typing import Tuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from scipy.optimize import least_squares, OptimizeResult
+from typing import List, Optional, Tuple
+from collections import namedtuple
+from scipy.stats import qmc
 import numpy as np
 import itertools
+import logging
 import math
+import os
+
+# Fewer starts than this run serially: each start takes about 1 ms, far less than
+# starting a process pool (tens of ms, more with spawn on Windows, which re-imports the caller's modules)
+POOL_MIN_STARTS = 256
+
+# Outcome of one start of the multi-start origin solve
+StartResult = namedtuple('StartResult', ['initial_guess', 'x', 'cost', 'nfev', 'success', 'message'])
+
 
 def num_to_range(num, inMin, inMax, outMin, outMax):
   return outMin + (float(num - inMin) / float(inMax - inMin) * (outMax
                   - outMin))
 
-def solve_for_mxyz(points: np.ndarray, angles: np.ndarray, initial_guess: np.ndarray = np.zeros(3), max_iterations: int = 2000) -> np.ndarray:
+def angle_residuals(m: np.ndarray, points: np.ndarray, angles_rad: np.ndarray) -> np.ndarray:
+    """
+    Residuals between the angles subtended at m by successive points and the measured angles.
+
+    Args:
+    m (np.ndarray): Candidate local origin (mx, my, mz).
+    points (np.ndarray): (N+1, 3) array of points' coordinates.
+    angles_rad (np.ndarray): (N,) measured angles in radians between successive points.
+
+    Returns:
+    np.ndarray: (N,) residuals, calculated minus measured angle magnitude.
+    """
+    a = points[:-1] - m
+    b = points[1:] - m
+    norm_a = np.sqrt(np.einsum('ij,ij->i', a, a))
+    norm_b = np.sqrt(np.einsum('ij,ij->i', b, b))
+    cosine = np.clip(np.einsum('ij,ij->i', a, b) / (norm_a * norm_b), -1.0, 1.0)
+    return np.arccos(cosine) - np.abs(angles_rad)
+
+def angle_jacobian(m: np.ndarray, points: np.ndarray, angles_rad: np.ndarray) -> np.ndarray:
+    """
+    Analytic Jacobian of angle_residuals with respect to m.
+
+    With a = p_i - m, b = p_i+1 - m and c = a.b / (|a||b|), the angle is arccos(c) and
+    d(angle)/dm = (dc/da + dc/db) / sqrt(1 - c^2), where dc/da = b/(|a||b|) - c a/|a|^2.
+
+    Args:
+    m (np.ndarray): Candidate local origin (mx, my, mz).
+    points (np.ndarray): (N+1, 3) array of points' coordinates.
+    angles_rad (np.ndarray): (N,) measured angles in radians (unused; kept for the solver interface).
+
+    Returns:
+    np.ndarray: (N, 3) Jacobian matrix.
+    """
+    a = points[:-1] - m
+    b = points[1:] - m
+    norm_a_sq = np.einsum('ij,ij->i', a, a)
+    norm_b_sq = np.einsum('ij,ij->i', b, b)
+    inv_ab = 1.0 / np.sqrt(norm_a_sq * norm_b_sq)
+    cosine = np.clip(np.einsum('ij,ij->i', a, b) * inv_ab, -1.0, 1.0)
+
+    dc_da = b * inv_ab[:, None] - a * (cosine / norm_a_sq)[:, None]
+    dc_db = a * inv_ab[:, None] - b * (cosine / norm_b_sq)[:, None]
+
+    # Keep the derivative finite when the points are collinear with m
+    sine = np.maximum(np.sqrt(1.0 - cosine ** 2), 1e-12)
+    return (dc_da + dc_db) / sine[:, None]
+
+def intersect_lines(origins: np.ndarray, directions: np.ndarray, weights: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Least-squares intersection of N 3D lines, generalizing Calibrator.find_closest_points.
+
+    Minimizes the summed squared distance to every line, which is linear:
+    sum(I - d d^T) x = sum((I - d d^T) o) for unit directions d through origins o.
+
+    Args:
+    origins (np.ndarray): (N, 3) a point on each line.
+    directions (np.ndarray): (N, 3) direction of each line (need not be normalized).
+    weights (np.ndarray): Optional (N,) weight per line.
+
+    Returns:
+    np.ndarray: The point closest to all lines.
+    """
+    origins = np.asarray(origins, dtype=float)
+    directions = np.asarray(directions, dtype=float)
+    directions = directions / np.linalg.norm(directions, axis=1)[:, None]
+    if weights is None:
+        weights = np.ones(len(origins))
+
+    # Projectors onto each line's normal plane
+    projectors = np.eye(3) - directions[:, :, None] * directions[:, None, :]
+    projectors *= np.asarray(weights, dtype=float)[:, None, None]
+    A = projectors.sum(axis=0)
+    b = np.einsum('nij,nj->i', projectors, origins)
+
+    if np.linalg.cond(A) > 1e12:
+        raise ValueError("Lines are parallel")
+    return np.linalg.solve(A, b)
+
+def origin_search_bounds(points: np.ndarray, angles: np.ndarray, lines: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+                         margin: float = 2.0) -> np.ndarray:
+    """
+    Search box for the local origin derived from the measurements themselves.
+
+    With beam lines the box is centred on their intersection and sized by how far the
+    lines miss it. Otherwise it is centred on the points, with a half-width of margin
+    times the distance at which the points' span subtends the total measured angle
+    (span = 2 d sin(angle / 2)).
+
+    Args:
+    points (np.ndarray): The array of points' coordinates.
+    angles (np.ndarray): The array of angles in degrees between successive points.
+    lines (Tuple[np.ndarray, np.ndarray]): Optional (origins, directions) of lines through the local origin.
+    margin (float): Half-width of the box as a multiple of the estimated distance.
+
+    Returns:
+    np.ndarray: (3, 2) lower and upper bound per coordinate.
+    """
+    points = np.asarray(points, dtype=float)
+    span = np.linalg.norm(np.ptp(points, axis=0))
+    total_angle = min(np.radians(np.abs(np.asarray(angles, dtype=float))).sum(), np.pi)
+    reach = margin * span / max(2 * np.sin(total_angle / 2), 1e-3)
+
+    if lines is None:
+        center = points.mean(axis=0)
+    else:
+        # The intersection is already close; search as far as the lines miss it
+        origins, directions = (np.asarray(a, dtype=float) for a in lines)
+        center = intersect_lines(origins, directions)
+        directions = directions / np.linalg.norm(directions, axis=1)[:, None]
+        offsets = origins - center
+        misses = offsets - np.einsum('ij,ij->i', offsets, directions)[:, None] * directions
+        reach = margin * max(3 * np.sqrt(np.mean(np.einsum('ij,ij->i', misses, misses))), 0.05 * span)
+    return np.column_stack((center - reach, center + reach))
+
+def angle_cost_batch(candidates: np.ndarray, points: np.ndarray, angles_rad: np.ndarray) -> np.ndarray:
+    """
+    Sum of squared angle residuals for many candidate origins at once.
+
+    Args:
+    candidates (np.ndarray): (K, 3) candidate local origins.
+    points (np.ndarray): (N+1, 3) array of points' coordinates.
+    angles_rad (np.ndarray): (N,) measured angles in radians between successive points.
+
+    Returns:
+    np.ndarray: (K,) cost of each candidate.
+    """
+    vectors = points[None, :, :] - candidates[:, None, :]
+    vectors /= np.linalg.norm(vectors, axis=2)[:, :, None]
+    cosine = np.clip(np.einsum('kij,kij->ki', vectors[:, :-1], vectors[:, 1:]), -1.0, 1.0)
+    return ((np.arccos(cosine) - np.abs(angles_rad)) ** 2).sum(axis=1)
+
+def initial_origin_guess(points: np.ndarray, angles: np.ndarray, bounds: Optional[np.ndarray] = None,
+                         num_candidates: int = 1024, lines: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> np.ndarray:
+    """
+    Near-optimal starting point for the origin solve.
+
+    If the beam lines are known (e.g. the marker pairs recorded by Calibrator), their
+    least-squares intersection is used directly. Otherwise the angle-only problem has no
+    linear form, so a space-filling set of candidates in the search box is scored in one
+    vectorized pass and the best is returned. The box defaults to origin_search_bounds,
+    so it follows the data rather than a fixed rig position.
+
+    Args:
+    points (np.ndarray): The array of points' coordinates.
+    angles (np.ndarray): The array of angles in degrees between successive points.
+    bounds (np.ndarray): (3, 2) search box for the coarse search (default from origin_search_bounds).
+    num_candidates (int): Number of candidates scored in the coarse search.
+    lines (Tuple[np.ndarray, np.ndarray]): Optional (origins, directions) of lines through the local origin.
+
+    Returns:
+    np.ndarray: Initial estimate of mx, my, and mz.
+    """
+    if lines is not None:
+        return intersect_lines(*lines)
+
+    points = np.asarray(points, dtype=float)
+    angles_rad = np.radians(np.asarray(angles, dtype=float))
+    if bounds is None:
+        bounds = origin_search_bounds(points, angles)
+    candidates = start_design(num_candidates, bounds, seed=0)
+    return candidates[np.argmin(angle_cost_batch(candidates, points, angles_rad))]
+
+def solve_for_mxyz_lsq(points: np.ndarray, angles: np.ndarray, initial_guess: np.ndarray, xtol: float = 1e-10,
+                       max_nfev: Optional[int] = None) -> OptimizeResult:
+    """
+    Solve for mx, my, and mz by nonlinear least squares on the vectorized angle residuals.
+
+    Uses Levenberg-Marquardt with the analytic Jacobian; falls back to a trust region
+    solver when there are fewer angles than unknowns, which LM does not support.
+
+    Args:
+    points (np.ndarray): The array of points' coordinates.
+    angles (np.ndarray): The array of angles in degrees between successive points.
+    initial_guess (np.ndarray): Starting estimate of the local origin.
+    xtol (float): Tolerance on the change of the origin estimate.
+    max_nfev (int): Maximum number of function evaluations, None for scipy's default.
+
+    Returns:
+    OptimizeResult: scipy least_squares result; .x holds mx, my, and mz and .cost half the squared residual sum.
+    """
+    points = np.asarray(points, dtype=float)
+    angles_rad = np.radians(np.asarray(angles, dtype=float))
+    method = 'lm' if len(angles_rad) >= 3 else 'trf'
+    return least_squares(angle_residuals, np.asarray(initial_guess, dtype=float), jac=angle_jacobian,
+                         args=(points, angles_rad), method=method, xtol=xtol, ftol=1e-12, max_nfev=max_nfev)
+
+def solve_for_mxyz(points: np.ndarray, angles: np.ndarray, initial_guess: Optional[np.ndarray] = None, max_iterations: int = 2000) -> np.ndarray:
     """
     Solve for mx, my, and mz given a list of points and the respective angles between successive points.
 
     Args:
     points (np.ndarray): The array of points' coordinates.
     angles (np.ndarray): The array of angles in degrees between successive points.
+    initial_guess (np.ndarray): Starting estimate of the local origin (default from initial_origin_guess).
+    max_iterations (int): Maximum number of Jacobian evaluations.
 
     Returns:
     np.ndarray: The solved values of mx, my, and mz.
     """
-    def equations(vars):
-        mx, my, mz = vars
-        equations = []
-        for i in range(len(angles)):
-            vector_1 = points[i] - np.array([mx, my, mz])
-            vector_2 = points[i + 1] - np.array([mx, my, mz])
-            dot_product = np.dot(vector_1, vector_2)
-            mag_1 = np.linalg.norm(vector_1)
-            mag_2 = np.linalg.norm(vector_2)
-            angle_rad = np.radians(angles[i])
-            eq = np.cos(angle_rad) - (dot_product / (mag_1 * mag_2))
-            equations.append(eq)
-        return equations
-    return fsolve(equations, np.array([40, 20, 0]), xtol=0.00005)
+    if initial_guess is None:
+        initial_guess = initial_origin_guess(points, angles)
+    return solve_for_mxyz_lsq(points, angles, initial_guess, xtol=0.00005, max_nfev=max_iterations).x
+
+def _run_starts(points: np.ndarray, angles: np.ndarray, initial_guesses: np.ndarray) -> List[StartResult]:
+    """
+    Solve from each initial guess in turn, in this process or inside a pool worker.
+    """
+    results = []
+    for initial_guess in initial_guesses:
+        result = solve_for_mxyz_lsq(points, angles, initial_guess)
+        results.append(StartResult(initial_guess, result.x, 2 * result.cost, result.nfev, result.success, result.message))
+    return results
+
+def start_design(num_starts: int, bounds: np.ndarray, design: str = 'sobol', seed: Optional[int] = None) -> np.ndarray:
+    """
+    Space-filling initial guesses inside a search box.
+
+    Args:
+    num_starts (int): Number of initial guesses.
+    bounds (np.ndarray): (3, 2) lower and upper bound per coordinate.
+    design (str): 'sobol' for a scrambled Sobol sequence or 'lhs' for a Latin hypercube.
+    seed (int): Seed for the scrambling, None for a random design.
+
+    Returns:
+    np.ndarray: (num_starts, 3) initial guesses.
+    """
+    bounds = np.asarray(bounds, dtype=float)
+    if design == 'sobol':
+        # Sobol points are balanced in powers of two; take the leading part of the next one
+        sample = qmc.Sobol(d=3, scramble=True, seed=seed).random_base2(max(int(np.ceil(np.log2(num_starts))), 0))[:num_starts]
+    elif design == 'lhs':
+        sample = qmc.LatinHypercube(d=3, seed=seed).random(num_starts)
+    else:
+        raise ValueError(f"Unknown design '{design}', expected 'sobol' or 'lhs'.")
+    return qmc.scale(sample, bounds[:, 0], bounds[:, 1])
+
+def multi_start_solve(points: np.ndarray, angles: np.ndarray, num_starts: int = 32, bounds: Optional[np.ndarray] = None,
+                      design: str = 'sobol', agree_count: int = 3, agree_tol: float = 0.5, cost_tol: float = 1e-6,
+                      max_workers: Optional[int] = None, starts_per_task: int = 2, seed: Optional[int] = None) -> Tuple[np.ndarray, List[StartResult]]:
+    """
+    Multi-start origin solve with early termination, optionally spread over a process pool.
+
+    Starts are drawn from a space-filling design and handed to the workers in small
+    batches. As results come in, the best solution so far is compared with the others.
+    Once agree_count converged starts lie within agree_tol of it and within cost_tol of
+    its cost, the remaining batches are cancelled.
+
+    Args:
+    points (np.ndarray): The array of points' coordinates.
+    angles (np.ndarray): The array of angles in degrees between successive points.
+    num_starts (int): Maximum number of starts.
+    bounds (np.ndarray): (3, 2) search box for the initial guesses (default from origin_search_bounds).
+    design (str): 'sobol' or 'lhs', see start_design.
+    agree_count (int): Number of agreeing starts (including the best) that ends the search.
+    agree_tol (float): Distance within which two solutions agree, in the points' units.
+    cost_tol (float): Sum of squared residuals (rad^2) above the best within which a start counts as agreeing.
+    max_workers (int): Pool size. By default the starts run in this process unless there are at least
+                       POOL_MIN_STARTS of them, in which case the pool uses every CPU. With 1 they always run here.
+    starts_per_task (int): Starts per pool task; larger batches cut IPC overhead but react later.
+    seed (int): Seed for the start design.
 
-def solve_for_mxyz_minimize(points: np.ndarray, angles: np.ndarray, num_starts: int =10) -> np.ndarray:
+    Returns:
+    Tuple[np.ndarray, List[StartResult]]: The best mx, my, mz and the diagnostics of every start that ran.
+    """
+    points = np.asarray(points, dtype=float)
+    angles = np.asarray(angles, dtype=float)
+    if bounds is None:
+        bounds = origin_search_bounds(points, angles)
+    initial_guesses = start_design(num_starts, bounds, design, seed)
+    batches = [initial_guesses[i:i + starts_per_task] for i in range(0, num_starts, starts_per_task)]
+
+    results = []
+
+    def agreed() -> bool:
+        best = min(results, key=lambda r: r.cost)
+        agreeing = [r for r in results if r.success and r.cost <= best.cost + cost_tol
+                    and np.linalg.norm(r.x - best.x) <= agree_tol]
+        return len(agreeing) >= agree_count
+
+    if max_workers is None:
+        max_workers = (os.cpu_count() or 1) if num_starts >= POOL_MIN_STARTS else 1
+
+    if max_workers <= 1:
+        for batch in batches:
+            results.extend(_run_starts(points, angles, batch))
+            if agreed():
+                break
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(_run_starts, points, angles, batch) for batch in batches]
+            for future in as_completed(futures):
+                results.extend(future.result())
+                if agreed():
+                    for pending in futures:
+                        pending.cancel()
+                    break
+
+    best = min(results, key=lambda r: r.cost)
+    logging.debug(f"Multi-start solve: {len(results)}/{num_starts} starts run, best cost {best.cost:.3e}, {best.message}")
+    return best.x, results
+
+def solve_for_mxyz_minimize(points: np.ndarray, angles: np.ndarray, num_starts: int =10, cost_tol: float = 1e-6,
+                            lines: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> np.ndarray:
     """
-    Solve for mx, my, and mz using optimization (minimize) given a list of points and the respective angles between successive points.
+    Solve for mx, my, and mz given a list of points and the respective angles between successive points.
+
+    A single solve from initial_origin_guess normally converges; the multi-start
+    search only runs if that solve ends with a cost above cost_tol.
 
     Args:
     points (np.ndarray): The array of points' coordinates.
     angles (np.ndarray): The array of angles in degrees between successive points.
-    num_starts (int): The number of random starts for the optimization.
+    num_starts (int): The maximum number of starts if the single solve fails.
+    cost_tol (float): Sum of squared residuals (rad^2) accepted from the single solve.
+    lines (Tuple[np.ndarray, np.ndarray]): Optional beam lines, e.g. Calibrator.beam_lines(), for a closed-form start.
 
     Returns:
     np.ndarray: The optimized values of mx, my, and mz.
     """
+    result = solve_for_mxyz_lsq(points, angles, initial_origin_guess(points, angles, lines=lines))
+    if result.success and 2 * result.cost <= cost_tol:
+        return result.x
 
-    def objective(vars: np.ndarray) -> float:
-        mx, my, mz = vars
-        total_error = 0.0
-        for i in range(len(angles)):
-            vector_1 = points[i] - np.array([mx, my, mz])
-            vector_2 = points[i + 1] - np.array([mx, my, mz])
-            dot_product = np.dot(vector_1, vector_2)
-            mag_1 = np.linalg.norm(vector_1)
-            mag_2 = np.linalg.norm(vector_2)
-            angle_cosine = dot_product / (mag_1 * mag_2)
-            angle_cosine = np.clip(angle_cosine, -1.0, 1.0)  # Clamping the value
-            calculated_angle = np.arccos(angle_cosine)
-            angle_rad = np.radians(angles[i])
-            error = (angle_rad - calculated_angle) ** 2
-            total_error += error
-        return total_error
-
-    best_result = None
-    best_error = np.inf
-
-    for _ in range(num_starts):
-        initial_guess = np.array([np.random.uniform(-110, -70), np.random.uniform(380, 420), np.random.uniform(640, 680)])
-        print(f'Initial guess: {initial_guess}')
-        result = minimize(objective, initial_guess, method='nelder-mead', options={'maxiter': 5000, 'xatol': 1e-2, 'fatol': 1e-2})
-        if result.fun < best_error:
-            best_error = result.fun
-            best_result = result
-
-    print(f'Optimization result message: {best_result.message}')
-    print(f'Optimization result fun: {best_result.fun}')
-    print(f'Optimization result success: {best_result.success}\n')
-    return best_result.x
+    logging.info(f"Single-start origin solve ended with cost {2 * result.cost:.3e}; running multi-start search.")
+    best_x, _ = multi_start_solve(points, angles, num_starts, bounds=origin_search_bounds(points, angles, lines))
+    return best_x
 
 def def_local_coor_sys(points: np.ndarray, local_origin: np.ndarray, axis_idx: int = 1) -> np.ndarray:
     """
@@ -167,6 +436,92 @@ def svd(points: np.ndarray) -> np.ndarray:
 
     return rotation_matrix
 
+def beam_directions(pan: np.ndarray, tilt: np.ndarray) -> np.ndarray:
+    """
+    Unit beam directions in the local frame for geometric pan and tilt angles, the inverse of calc_rot_comp.
+
+    Args:
+    pan (np.ndarray): (N,) pan angles in degrees, atan2(y, x) in the local frame.
+    tilt (np.ndarray): (N,) tilt angles in degrees, elevation above the local XY plane.
+
+    Returns:
+    np.ndarray: (N, 3) unit vectors.
+    """
+    pan = np.radians(np.asarray(pan, dtype=float))
+    tilt = np.radians(np.asarray(tilt, dtype=float))
+    return np.column_stack((np.cos(tilt) * np.cos(pan), np.cos(tilt) * np.sin(pan), np.sin(tilt)))
+
+def fit_rotation(local_directions: np.ndarray, global_directions: np.ndarray) -> np.ndarray:
+    """
+    Rotation best mapping local directions onto global ones, by SVD (Kabsch / Wahba).
+
+    Args:
+    local_directions (np.ndarray): (N, 3) unit vectors in the local frame.
+    global_directions (np.ndarray): (N, 3) matching unit vectors in the global frame.
+
+    Returns:
+    np.ndarray: Rotation matrix whose columns are the local axes in global coordinates.
+    """
+    u, s, vh = np.linalg.svd(np.asarray(global_directions).T @ np.asarray(local_directions))
+    if s[1] < 1e-9 * s[0]:
+        raise ValueError("Directions are parallel; samples at different pan/tilt angles are needed.")
+
+    # Force a proper rotation even if the data would be better fit by a reflection
+    d = np.sign(np.linalg.det(u @ vh))
+    return u @ np.diag([1.0, 1.0, d]) @ vh
+
+class LocalTransform:
+    """
+    Precomputed global-to-local transform for a calibrated rig.
+
+    Built once whenever calibration is loaded or changes. The rotation matrix is
+    orthonormal, so its inverse is its transpose and the origin shift can be folded
+    in ahead of time: local = R^T p - R^T o.
+
+    Args:
+    local_origin (np.ndarray): The local origin in global coordinates.
+    rotation_matrix (np.ndarray): Rotation matrix whose columns are the local axes.
+    """
+    def __init__(self, local_origin: np.ndarray, rotation_matrix: np.ndarray):
+        self.local_origin = np.asarray(local_origin, dtype=float)
+        self.rotation_matrix = np.asarray(rotation_matrix, dtype=float)
+
+        # Rounded or hand-edited matrices may not be exactly orthonormal; invert those properly once
+        if np.allclose(self.rotation_matrix.T @ self.rotation_matrix, np.eye(3), atol=1e-6):
+            inverse = self.rotation_matrix.T
+        else:
+            inverse = np.linalg.inv(self.rotation_matrix)
+
+        self.inverse = np.ascontiguousarray(inverse)
+        self.offset = self.inverse @ self.local_origin
+
+        # Right-multiplication form for row-vector batches: points @ inverse.T
+        self._inverse_t = np.ascontiguousarray(self.inverse.T)
+
+    def to_local(self, point_global: np.ndarray) -> np.ndarray:
+        """
+        Transform a single point from global to local coordinates.
+
+        Args:
+        point_global (np.ndarray): The point's coordinates in the global coordinate system.
+
+        Returns:
+        np.ndarray: The point's coordinates in the local coordinate system.
+        """
+        return self.inverse @ point_global - self.offset
+
+    def to_local_batch(self, points_global: np.ndarray) -> np.ndarray:
+        """
+        Transform an (N, 3) array of points from global to local coordinates.
+
+        Args:
+        points_global (np.ndarray): The points' coordinates in the global coordinate system.
+
+        Returns:
+        np.ndarray: The (N, 3) points in the local coordinate system.
+        """
+        return points_global @ self._inverse_t - self.offset
+
 def global_to_local(point_global: np.ndarray, rotation_matrix: np.ndarray) -> np.ndarray:
     """
     Transform a point from global coordinates to local coordinates using a rotation matrix.
@@ -194,19 +549,25 @@ def calc_rot_comp(point_local: np.ndarray) -> Tuple[float, float]:
     tilt_angle = math.degrees(math.atan2(point_local[2], math.sqrt(point_local[0]**2 + point_local[2]**2)))
     return pan_angle, tilt_angle
 
-def calibrate(points: np.ndarray, angles: np.ndarray, initial_guess: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+def calibrate(points: np.ndarray, angles: np.ndarray, initial_guess: Optional[np.ndarray] = None,
+              lines: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> Tuple[np.ndarray, np.ndarray]:
     """
     Calibrate the local coordinate system using a list of points and the respective angles between successive points.
 
     Args:
     points (np.ndarray): The array of points' coordinates.
     angles (np.ndarray): The array of angles in degrees between successive points.
+    initial_guess (np.ndarray): Optional starting estimate of the local origin.
+    lines (Tuple[np.ndarray, np.ndarray]): Optional beam lines, e.g. Calibrator.beam_lines().
 
     Returns:
     Tuple[np.ndarray, np.ndarray]: The solved values of mx, my, and mz, and the rotation matrix.
     """
     # Find local origin point
-    mx, my, mz = solve_for_mxyz_minimize(points, angles, 50)
+    if initial_guess is not None:
+        mx, my, mz = solve_for_mxyz(points, angles, initial_guess)
+    else:
+        mx, my, mz = solve_for_mxyz_minimize(points, angles, 50, lines=lines)
     local_origin = np.round(np.array([mx, my, mz]), 5)
     print(f"Solved local origin: {local_origin}")
 
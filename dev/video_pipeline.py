@@ -0,0 +1,157 @@
+from threading import Thread, Condition, Event
+from typing import Optional, Tuple
+from recorder import FrameRecorder
+import numpy as np
+import logging
+import time
+import os
+import cv2
+
+
+class LatestFrame:
+    """
+    Single-slot handoff that always holds the newest frame.
+
+    Writers overwrite the slot without waiting; a frame nobody picked up before the
+    next one arrived is dropped and counted. Readers pass the sequence number of the
+    last frame they consumed and only get something back once a newer one exists.
+    """
+    def __init__(self):
+        self._cond = Condition()
+        self._frame = None
+        self.sequence = 0
+        self.dropped = 0
+        self._consumed = 0
+
+    def put(self, frame: np.ndarray) -> None:
+        with self._cond:
+            if self.sequence > self._consumed:
+                self.dropped += 1
+            self._frame = frame
+            self.sequence += 1
+            self._cond.notify_all()
+
+    def get(self, after: int = 0) -> Optional[Tuple[int, np.ndarray]]:
+        """
+        Non-blocking read for the GUI thread.
+        :param after: Sequence number of the last frame the caller consumed
+        :return: (sequence, frame) if a newer frame exists, else None
+        """
+        with self._cond:
+            if self.sequence <= after:
+                return None
+            self._consumed = self.sequence
+            return self.sequence, self._frame
+
+
+class VideoPipeline:
+    """
+    Live feed off the Tk thread: capture -> process -> latest-frame slot -> GUI.
+
+    The capture thread grabs frames as fast as the camera delivers them into the
+    camera manager's preallocated FrameBufferRing. The processing worker always borrows
+    the newest frame, so if processing is slower than the camera the frames in between
+    are skipped rather than queued.
+    Each processed frame is flipped, run through the ImageProcessor, converted to RGB
+    and put in the display slot. The GUI polls that slot with get() and only builds
+    the PhotoImage. Saved frames are appended to a frame container by a FrameRecorder
+    that drops new frames when the disk falls behind, so disk stalls never hold up
+    processing.
+    :param camera_manager: Opened CameraManager to read from
+    :param image_processor: ImageProcessor applied to every displayed frame
+    :param image_folder: Folder for saved frames
+    :param save_queue_size: Frames waiting for the disk before new ones are dropped
+    """
+    def __init__(self, camera_manager, image_processor, image_folder: str = "images", save_queue_size: int = 8):
+        self.camera_manager = camera_manager
+        self.image_processor = image_processor
+        self.image_folder = image_folder
+        self.is_saving = False
+
+        self.display = LatestFrame()
+        self.recorder = None
+        self.save_queue_size = save_queue_size
+
+        self._stop_event = Event()
+        self._threads = []
+
+        # Rates over the last stats() interval
+        self.captured = 0
+        self.processed = 0
+        self.processed_total = 0
+        self._stats_time = time.perf_counter()
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        self._stop_event.clear()
+        self.recorder = FrameRecorder(self.image_folder, num_workers=1, queue_size=self.save_queue_size,
+                                      policy='drop_newest', container=True)
+        self._threads = [Thread(target=self._capture, daemon=True),
+                         Thread(target=self._process, daemon=True)]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+        self._threads = []
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
+    def latest(self, after: int = 0) -> Optional[Tuple[int, np.ndarray]]:
+        """
+        Newest processed RGB frame for display, without blocking.
+        :param after: Sequence number of the last frame displayed
+        :return: (sequence, frame) or None if nothing new
+        """
+        return self.display.get(after)
+
+    def stats(self) -> Tuple[float, float, int, int]:
+        """
+        :return: Capture and processing rates (Hz) since the last call, frames skipped by the worker and by the display
+        """
+        now = time.perf_counter()
+        elapsed = max(now - self._stats_time, 1e-9)
+        rates = self.captured / elapsed, self.processed / elapsed
+        self.captured = self.processed = 0
+        self._stats_time = now
+        skipped = self.camera_manager.ring.count - self.processed_total
+        return rates[0], rates[1], skipped, self.display.dropped
+
+    def _capture(self) -> None:
+        while not self._stop_event.is_set():
+            if self.camera_manager.grab() is None:
+                # Camera not ready or released; avoid spinning on it
+                time.sleep(0.01)
+                continue
+            self.captured += 1
+
+    def _process(self) -> None:
+        ring = self.camera_manager.ring
+        frame_number = -1
+        while not self._stop_event.is_set():
+            index = ring.borrow_latest(frame_number, timeout=0.1)
+            if index is None:
+                continue
+            frame_number = ring.frame_numbers[index]
+
+            try:
+                # Flip the frame horizontally into a new array, which frees the ring slot straight away
+                frame = cv2.flip(ring.frame(index), 1)
+            finally:
+                ring.release(index)
+
+            try:
+                # Process the frame with all the selected options
+                processed_frame = self.image_processor.process_frame(frame)
+                if self.is_saving:
+                    self.recorder.submit(processed_frame, frame_id=int(frame_number))
+                code = cv2.COLOR_GRAY2RGB if processed_frame.ndim == 2 else cv2.COLOR_BGR2RGB
+                self.display.put(cv2.cvtColor(processed_frame, code))
+                self.processed += 1
+                self.processed_total += 1
+            except Exception as e:
+                logging.error(f"Error processing frame: {e}")
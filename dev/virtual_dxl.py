@@ -0,0 +1,439 @@
+from dxl_packets import update_crc
+from threading import Thread, Lock
+from typing import Dict, List, Optional
+import multiprocessing
+import argparse
+import logging
+import select
+import struct
+import math
+import time
+import tty
+import os
+
+# Protocol 2.0 instructions served by the virtual bus
+INST_PING = 0x01
+INST_READ = 0x02
+INST_WRITE = 0x03
+INST_STATUS = 0x55
+INST_SYNC_READ = 0x82
+INST_SYNC_WRITE = 0x83
+INST_BULK_READ = 0x92
+INST_BULK_WRITE = 0x93
+BROADCAST_ID = 0xFE
+
+# Status packet error codes
+ERR_INSTRUCTION = 0x02
+ERR_CRC = 0x03
+ERR_ACCESS = 0x07
+
+HEADER = b'\xff\xff\xfd\x00'
+
+# X-series control table addresses used by the model
+ADDR_MODEL_NUMBER = 0
+ADDR_FIRMWARE = 6
+ADDR_ID = 7
+ADDR_RETURN_DELAY = 9
+ADDR_OP_MODE = 11
+ADDR_TORQUE_ENABLE = 64
+ADDR_GOAL_PWM = 100
+ADDR_GOAL_CURRENT = 102
+ADDR_GOAL_VELOCITY = 104
+ADDR_GOAL_POSITION = 116
+ADDR_PRESENT_PWM = 124
+ADDR_PRESENT_CURRENT = 126
+ADDR_PRESENT_VELOCITY = 128
+ADDR_PRESENT_POSITION = 132
+ADDR_INDIRECT_ADDR = 168
+ADDR_INDIRECT_DATA = 224
+INDIRECT_SLOTS = 20
+CONTROL_TABLE_SIZE = 1024
+
+# Register unit conversions (XM430-W350)
+VELOCITY_UNIT = 0.229 * 4096 / 60      # ticks/s per velocity LSB
+PWM_LIMIT = 885
+CURRENT_LIMIT = 1193
+
+
+class VirtualServo:
+    '''
+    X-series servo model with a Protocol 2.0 control table.
+
+    Position modes behave as a closed-loop second-order system with natural frequency
+    `bandwidth_hz` and damping `damping`. PWM, current and velocity modes drive a
+    first-order velocity lag with time constant `time_constant`. Present registers are
+    refreshed from the model whenever the control table is read.
+
+    Parameters:
+    - motor_id (int): Dynamixel ID.
+    - position (int): Initial position in ticks.
+    - bandwidth_hz (float): Closed-loop position bandwidth.
+    - damping (float): Closed-loop position damping ratio.
+    - time_constant (float): Velocity response time constant in seconds.
+    - max_velocity (float): No-load speed in ticks/s.
+    '''
+    def __init__(self, motor_id: int, position: int = 2048, bandwidth_hz: float = 6.0, damping: float = 0.7,
+                 time_constant: float = 0.05, max_velocity: float = 3140.0) -> None:
+        self.table = bytearray(CONTROL_TABLE_SIZE)
+        struct.pack_into('<H', self.table, ADDR_MODEL_NUMBER, 1020)
+        self.table[ADDR_FIRMWARE] = 45
+        self.table[ADDR_ID] = motor_id
+        self.table[ADDR_RETURN_DELAY] = 250
+        self.table[ADDR_OP_MODE] = 3
+        struct.pack_into('<i', self.table, ADDR_GOAL_POSITION, position)
+
+        self.wn = 2 * math.pi * bandwidth_hz
+        self.damping = damping
+        self.time_constant = time_constant
+        self.max_velocity = max_velocity
+
+        # Model state in ticks and ticks/s
+        self.position = float(position)
+        self.velocity = 0.0
+        self.acceleration = 0.0
+        self.last_update = time.perf_counter()
+        self._write_present()
+
+    @property
+    def motor_id(self) -> int:
+        return self.table[ADDR_ID]
+
+    @property
+    def return_delay(self) -> float:
+        return self.table[ADDR_RETURN_DELAY] * 2e-6
+
+    def _get(self, fmt: str, address: int) -> int:
+        return struct.unpack_from(fmt, self.table, address)[0]
+
+    def update(self, now: Optional[float] = None, max_step: float = 0.0005) -> None:
+        '''
+        Integrate the motor model up to `now`.
+        '''
+        now = time.perf_counter() if now is None else now
+        elapsed = min(now - self.last_update, 1.0)
+        self.last_update = now
+        if elapsed <= 0:
+            return
+
+        torque = self.table[ADDR_TORQUE_ENABLE]
+        mode = self.table[ADDR_OP_MODE]
+        goal_position = self._get('<i', ADDR_GOAL_POSITION)
+        goal_pwm = self._get('<h', ADDR_GOAL_PWM)
+        goal_current = self._get('<h', ADDR_GOAL_CURRENT)
+        goal_velocity = self._get('<i', ADDR_GOAL_VELOCITY) * VELOCITY_UNIT
+
+        steps = max(1, int(math.ceil(elapsed / max_step)))
+        dt = elapsed / steps
+        for _ in range(steps):
+            if not torque:
+                accel = -self.velocity / self.time_constant
+            elif mode in (3, 4, 5):
+                accel = self.wn ** 2 * (goal_position - self.position) - 2 * self.damping * self.wn * self.velocity
+            elif mode == 16:
+                accel = (goal_pwm / PWM_LIMIT * self.max_velocity - self.velocity) / self.time_constant
+            elif mode == 0:
+                accel = (goal_current / CURRENT_LIMIT * self.max_velocity - self.velocity) / self.time_constant
+            elif mode == 1:
+                accel = (goal_velocity - self.velocity) / self.time_constant
+            else:
+                accel = 0.0
+
+            # Semi-implicit Euler with the no-load speed as a hard limit
+            self.velocity = max(-self.max_velocity, min(self.max_velocity, self.velocity + accel * dt))
+            self.position += self.velocity * dt
+            self.acceleration = accel
+
+        self._write_present()
+
+    def _write_present(self) -> None:
+        # Present PWM/current are rough effort estimates from the demanded acceleration
+        effort = self.acceleration * self.time_constant / self.max_velocity if self.table[ADDR_TORQUE_ENABLE] else 0.0
+        effort = max(-1.0, min(1.0, effort + self.velocity / self.max_velocity))
+        struct.pack_into('<hhii', self.table, ADDR_PRESENT_PWM, int(effort * PWM_LIMIT), int(effort * CURRENT_LIMIT),
+                         int(self.velocity / VELOCITY_UNIT), int(round(self.position)))
+        self._sync_indirect()
+
+    def _indirect_addresses(self) -> List[int]:
+        return list(struct.unpack_from(f'<{INDIRECT_SLOTS}H', self.table, ADDR_INDIRECT_ADDR))
+
+    def _sync_indirect(self) -> None:
+        # Mirror mapped registers into the indirect data window
+        for slot, address in enumerate(self._indirect_addresses()):
+            if address:
+                self.table[ADDR_INDIRECT_DATA + slot] = self.table[address]
+
+    def read(self, address: int, length: int) -> bytes:
+        self.update()
+        return bytes(self.table[address:address + length])
+
+    def write(self, address: int, data: bytes) -> int:
+        '''
+        Write to the control table; returns a status error code.
+        '''
+        self.update()
+
+        # EEPROM area is locked while torque is enabled
+        if address < ADDR_TORQUE_ENABLE and self.table[ADDR_TORQUE_ENABLE]:
+            return ERR_ACCESS
+
+        self.table[address:address + len(data)] = data
+
+        # Writes into the indirect data window go through to the mapped registers
+        if address + len(data) > ADDR_INDIRECT_DATA and address < ADDR_INDIRECT_DATA + INDIRECT_SLOTS:
+            for slot, target in enumerate(self._indirect_addresses()):
+                offset = ADDR_INDIRECT_DATA + slot - address
+                if target and 0 <= offset < len(data):
+                    self.table[target] = data[offset]
+
+        return 0
+
+
+class VirtualBus:
+    '''
+    Pseudo-terminal serial device that speaks Dynamixel Protocol 2.0 to a set of virtual servos.
+
+    The slave end of the pty (`port_name`) can be opened by PortHandler exactly like a
+    U2D2. Each reply is delayed by its servo's return delay time and the time the
+    bytes would take on the wire at `baud_rate`. All replies to one instruction reach
+    the host together after one further USB latency period, as with a U2D2 whose
+    latency timer flushes the burst, so sync and bulk reads pay it once.
+
+    Parameters:
+    - servos (List[VirtualServo]): Servos on the bus.
+    - baud_rate (int): Simulated bus speed used for transmission delays.
+    - latency (float): Extra delay per host-bound burst in seconds, e.g. the USB latency timer.
+    '''
+    def __init__(self, servos: List[VirtualServo], baud_rate: int = 4000000, latency: float = 0.001) -> None:
+        self.servos: Dict[int, VirtualServo] = {servo.motor_id: servo for servo in servos}
+        self.baud_rate = baud_rate
+        self.latency = latency
+
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.master)
+        tty.setraw(self.slave)
+        self.port_name = os.ttyname(self.slave)
+
+        self._rx = bytearray()
+        self._burst = bytearray()
+        self._lock = Lock()
+        self._running = False
+        self._thread = None
+
+        # Served instruction counts for benchmarking
+        self.packets = 0
+        self.crc_errors = 0
+
+    def start(self) -> None:
+        self._running = True
+        self._thread = Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+
+    def serve_forever(self) -> None:
+        self._running = True
+        while self._running:
+            readable, _, _ = select.select([self.master], [], [], 0.1)
+            if not readable:
+                continue
+            try:
+                self._rx += os.read(self.master, 4096)
+            except OSError:
+                continue
+            self._process()
+
+    def _process(self) -> None:
+        while True:
+            start = self._rx.find(HEADER)
+            if start < 0:
+                # Keep a possible partial header
+                del self._rx[:max(0, len(self._rx) - 3)]
+                return
+            del self._rx[:start]
+            if len(self._rx) < 7:
+                return
+
+            length = self._rx[5] | (self._rx[6] << 8)
+            size = 7 + length
+            if len(self._rx) < size:
+                return
+
+            packet = bytes(self._rx[:size])
+            del self._rx[:size]
+
+            crc = packet[-2] | (packet[-1] << 8)
+            if update_crc(0, packet[:-2]) != crc:
+                self.crc_errors += 1
+                continue
+
+            # Remove byte stuffing from instruction and parameters
+            body = packet[7:-2].replace(b'\xff\xff\xfd\xfd', b'\xff\xff\xfd')
+            self.packets += 1
+            self._dispatch(packet[4], body[0], body[1:])
+            self._flush()
+
+    def _dispatch(self, dxl_id: int, instruction: int, params: bytes) -> None:
+        if instruction == INST_PING:
+            ids = sorted(self.servos) if dxl_id == BROADCAST_ID else [dxl_id]
+            for motor_id in ids:
+                servo = self.servos.get(motor_id)
+                if servo is not None:
+                    self._reply(servo, 0, servo.read(ADDR_MODEL_NUMBER, 2) + servo.read(ADDR_FIRMWARE, 1))
+
+        elif instruction == INST_READ:
+            address, length = struct.unpack_from('<HH', params)
+            servo = self.servos.get(dxl_id)
+            if servo is not None:
+                self._reply(servo, 0, servo.read(address, length))
+
+        elif instruction == INST_WRITE:
+            address, = struct.unpack_from('<H', params)
+            targets = self.servos.values() if dxl_id == BROADCAST_ID else [self.servos.get(dxl_id)]
+            for servo in targets:
+                if servo is None:
+                    continue
+                error = servo.write(address, params[2:])
+                if dxl_id != BROADCAST_ID:
+                    self._reply(servo, error, b'')
+
+        elif instruction == INST_SYNC_READ:
+            address, length = struct.unpack_from('<HH', params)
+            for motor_id in params[4:]:
+                servo = self.servos.get(motor_id)
+                if servo is not None:
+                    self._reply(servo, 0, servo.read(address, length))
+
+        elif instruction == INST_SYNC_WRITE:
+            address, length = struct.unpack_from('<HH', params)
+            for offset in range(4, len(params), length + 1):
+                servo = self.servos.get(params[offset])
+                if servo is not None:
+                    servo.write(address, params[offset + 1:offset + 1 + length])
+
+        elif instruction == INST_BULK_READ:
+            for offset in range(0, len(params), 5):
+                motor_id, address, length = struct.unpack_from('<BHH', params, offset)
+                servo = self.servos.get(motor_id)
+                if servo is not None:
+                    self._reply(servo, 0, servo.read(address, length))
+
+        elif instruction == INST_BULK_WRITE:
+            offset = 0
+            while offset < len(params):
+                motor_id, address, length = struct.unpack_from('<BHH', params, offset)
+                servo = self.servos.get(motor_id)
+                if servo is not None:
+                    servo.write(address, params[offset + 5:offset + 5 + length])
+                offset += 5 + length
+
+        elif dxl_id in self.servos:
+            self._reply(self.servos[dxl_id], ERR_INSTRUCTION, b'')
+
+    def _reply(self, servo: VirtualServo, error: int, params: bytes) -> None:
+        body = (bytes([INST_STATUS, error]) + params).replace(b'\xff\xff\xfd', b'\xff\xff\xfd\xfd')
+        packet = bytearray(HEADER + struct.pack('<BH', servo.motor_id, len(body) + 2) + body)
+        packet += struct.pack('<H', update_crc(0, packet))
+
+        # Return delay and wire time of this reply; the USB latency is added per burst in _flush
+        time.sleep(servo.return_delay + len(packet) * 10 / self.baud_rate)
+        self._burst += packet
+
+    def _flush(self) -> None:
+        if not self._burst:
+            return
+        time.sleep(self.latency)
+        os.write(self.master, self._burst)
+        self._burst.clear()
+
+    def close(self) -> None:
+        self.stop()
+        os.close(self.master)
+        os.close(self.slave)
+
+
+def serve(port_queue=None, baud_rate: int = 4000000, latency: float = 0.001) -> None:
+    '''
+    Run a two-servo virtual bus (pan ID 1, tilt ID 2) until interrupted.
+    '''
+    bus = VirtualBus([VirtualServo(1, position=2560), VirtualServo(2, position=3584)], baud_rate, latency)
+    if port_queue is not None:
+        port_queue.put(bus.port_name)
+    else:
+        print(f"Virtual Dynamixel bus on {bus.port_name}")
+    try:
+        bus.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        bus.close()
+
+
+def start_virtual_bus(baud_rate: int = 4000000, latency: float = 0.001):
+    '''
+    Start a virtual bus in a separate process so it does not share the caller's GIL.
+
+    Returns:
+    - Tuple[multiprocessing.Process, str]: Server process and the serial port name to open.
+    '''
+    port_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=serve, args=(port_queue, baud_rate, latency), daemon=True)
+    process.start()
+    return process, port_queue.get(timeout=5)
+
+
+def benchmark(port_name: str, iterations: int = 2000) -> None:
+    '''
+    Time every DynaController bus path against a running virtual bus.
+    '''
+    from dyna_controller import DynaController
+    from indirect_map import IndirectTelemetry
+    import numpy as np
+
+    dyna = DynaController(com_port=port_name)
+    dyna.open_port()
+    dyna.set_op_mode(dyna.pan_id, 3)
+    dyna.set_op_mode(dyna.tilt_id, 3)
+    indirect = IndirectTelemetry(dyna)
+    indirect.configure()
+
+    paths = {
+        "set_sync_pos": lambda: dyna.set_sync_pos(225, 315),
+        "get_sync_pos": dyna.get_sync_pos,
+        "get_sync_telemetry": dyna.get_sync_telemetry,
+        "set_sync_pos + get_sync_pos": lambda: (dyna.set_sync_pos(225, 315), dyna.get_sync_pos()),
+        "set_sync_pos + get_sync_telemetry": lambda: (dyna.set_sync_pos(225, 315), dyna.get_sync_telemetry()),
+        "indirect read": indirect.read,
+        "get_vel (per motor)": lambda: (dyna.get_vel(dyna.pan_id), dyna.get_vel(dyna.tilt_id)),
+    }
+
+    for name, call in paths.items():
+        samples = np.empty(iterations)
+        for i in range(iterations):
+            start = time.perf_counter()
+            call()
+            samples[i] = time.perf_counter() - start
+        p50, p99 = np.percentile(samples, [50, 99]) * 1e6
+        print(f"{name:34s} median {p50:8.1f} us   p99 {p99:8.1f} us   {1 / samples.mean():8.0f} Hz")
+
+    dyna.close_port()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Virtual Dynamixel Protocol 2.0 bus")
+    parser.add_argument("command", choices=["serve", "bench"])
+    parser.add_argument("--baud", type=int, default=4000000)
+    parser.add_argument("--latency", type=float, default=0.001, help="extra delay per reply burst in seconds")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.command == "serve":
+        serve(baud_rate=args.baud, latency=args.latency)
+    else:
+        process, port_name = start_virtual_bus(args.baud, args.latency)
+        benchmark(port_name, args.iterations)
+        process.terminate()